@@ -1,44 +1,343 @@
-from typing import Tuple, List
+from collections import Counter
+from os.path import abspath, dirname, join
+from typing import Tuple, List, Optional, Iterable, Iterator, Sequence, Dict
+
+import numpy as np
 
 from utils.math import multiply
 from utils.readers import OneColumnFileReader
-from utils.log import LOG, display_iterable
+from utils.log import LOG, phase, display_iterable
+
+INPUT_DIRECTORY = dirname(abspath(__file__))
+
+# Above this number of distinct value pairs, SumIndex does not build its pair table,
+# each pair costing 16 bytes: 64MB
+MAX_PAIR_SUMS = 4 * 10 ** 6
+# Number of elements of the intermediate arrays of SumIndex
+SUM_INDEX_BLOCK_SIZE = 1 << 20
+
 
-import itertools
+def find_pair_sum(data: Iterable[int], sum_to_check: int) -> Optional[Tuple[int, int]]:
+    """
+    Find two entries, at different indexes, summing to `sum_to_check` in O(n).
 
-test_reader = OneColumnFileReader("input-test.txt")
-test_data = test_reader.read(type_to_cast=int)
+    :param data: Data
+    :param sum_to_check: Value to check for
+    :return: Matching items or None
+    """
+    for pair in stream_pair_sum(data, sum_to_check):
+        return pair
+    return None
 
-reader = OneColumnFileReader("input.txt")
-prod_data = reader.read(type_to_cast=int)
 
-data_sources = (("Test data", test_data), ("Prod data", prod_data))
+def stream_pair_sum(
+    data: Iterable[int], sum_to_check: int
+) -> Iterator[Tuple[int, int]]:
+    """
+    Consume entries one by one and yield each pair summing to `sum_to_check` as soon
+    as its second entry arrives.
+
+    :param data: Data, can be an unbounded iterator
+    :param sum_to_check: Value to check for
+    :return: Matching pairs iterator
+    """
+    seen = set()
+    for value in data:
+        complement = sum_to_check - value
+        if complement in seen:
+            yield complement, value
+        seen.add(value)
+
+
+def find_sorted_k_sum(
+    sorted_data: Sequence[int], sum_to_check: int, k: int, start: int = 0
+) -> Optional[Tuple[int, ...]]:
+    """
+    Find k entries of sorted_data[start:], at different indexes, summing to
+    `sum_to_check`.
+
+    Each level fixes one entry, the last two are found with a two pointers scan:
+    O(n^(k-1)) time, no copy of the data.
+
+    :param sorted_data: Data sorted in ascending order
+    :param sum_to_check: Value to check for
+    :param k: Number of values in the combination, at least 2
+    :param start: First index to consider
+    :return: Matching items or None
+    """
+    end = len(sorted_data) - 1
+
+    if k == 2:
+        low, high = start, end
+        while low < high:
+            current_sum = sorted_data[low] + sorted_data[high]
+            if current_sum == sum_to_check:
+                return sorted_data[low], sorted_data[high]
+            if current_sum < sum_to_check:
+                low += 1
+            else:
+                high -= 1
+        return None
+
+    for index in range(start, end - k + 2):
+        value = sorted_data[index]
+        # Skip duplicates, they would explore the same combinations
+        if index > start and value == sorted_data[index - 1]:
+            continue
+        # The k smallest remaining entries are already too big
+        if value * k > sum_to_check:
+            break
+        result = find_sorted_k_sum(sorted_data, sum_to_check - value, k - 1, index + 1)
+        if result is not None:
+            return (value,) + result
+
+    return None
 
 
 def find_entry_sum_in_list(
     data: List, sum_to_check: int, number_of_elements_in_equation
-) -> Tuple[int, ...]:
+) -> Optional[Tuple[int, ...]]:
     """
     Given a list, find the n elements in said list that produced the `sum` value
     when summed
 
+    Each element is used at most once. Uses hashing for pairs and a sorted two
+    pointers search otherwise.
+
     :param data: Data
     :param sum_to_check: Value to check for
     :param number_of_elements_in_equation: Number of values in the combination
     :return: Matching items
     """
+    if number_of_elements_in_equation == 1:
+        return (sum_to_check,) if sum_to_check in data else None
+    if number_of_elements_in_equation == 2:
+        return find_pair_sum(data, sum_to_check)
+
+    return find_sorted_k_sum(
+        sorted(data), sum_to_check, number_of_elements_in_equation
+    )
+
+
+class SumIndex:
+    """
+    Index over a dataset answering batches of k-sum queries.
+
+    The distinct values and their multiplicity are indexed once. For k <= 3, a sorted
+    table of the pair sums of distinct values is built on first use, in blocks of
+    rows. Batches of targets are then answered with array operations: a searchsorted
+    of the targets in the table for pairs, and of every target minus every value for
+    triples. Larger k, or datasets whose table would exceed max_pair_sums, fall back
+    to find_sorted_k_sum on the presorted data, one target at a time.
+    """
+
+    sorted_data = None
+    counts = None
+    values = None
+    value_counts = None
+    max_pair_sums = None
+
+    def __init__(self, data: Iterable[int], max_pair_sums: int = MAX_PAIR_SUMS) -> None:
+        self.sorted_data = sorted(data)
+        self.counts = Counter(self.sorted_data)
+        self.values = np.array(sorted(self.counts), dtype=np.int64)
+        self.value_counts = np.array(
+            [self.counts[value] for value in self.values.tolist()], dtype=np.int64
+        )
+        self.max_pair_sums = max_pair_sums
+        self.__pair_sums = None
+
+    @property
+    def pair_sums(self) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Sorted sums of every pair of values that can be taken at different indexes,
+        None if the table would exceed max_pair_sums.
+
+        :return: Sums, index in values of the smaller and of the larger pair value
+        """
+        if self.__pair_sums is None:
+            size = len(self.values)
+            if size * (size + 1) // 2 > self.max_pair_sums:
+                return None
+
+            sums = []
+            firsts = []
+            seconds = []
+            indexes = np.arange(size)
+            block_size = max(1, SUM_INDEX_BLOCK_SIZE // max(size, 1))
+            for start in range(0, size, block_size):
+                rows = indexes[start : start + block_size, None]
+                # Upper triangle, diagonal included for repeated values only
+                mask = (indexes > rows) | (
+                    (indexes == rows) & (self.value_counts[rows] >= 2)
+                )
+                first, second = np.nonzero(mask)
+                first += start
+                sums.append(self.values[first] + self.values[second])
+                firsts.append(first.astype(np.int32))
+                seconds.append(second.astype(np.int32))
+
+            sums = np.concatenate(sums) if sums else np.zeros(0, dtype=np.int64)
+            order = np.argsort(sums, kind="stable")
+            self.__pair_sums = (
+                sums[order],
+                np.concatenate(firsts)[order] if firsts else np.zeros(0, np.int32),
+                np.concatenate(seconds)[order] if seconds else np.zeros(0, np.int32),
+            )
+        return self.__pair_sums
+
+    def is_available(self, *values: int) -> bool:
+        """
+        Check the dataset holds enough occurrences of each value
+
+        :param values: Values, possibly repeated
+        :return: Values can be taken at different indexes
+        """
+        return all(
+            self.counts[value] >= count for value, count in Counter(values).items()
+        )
+
+    def find(self, sum_to_check: int, k: int) -> Optional[Tuple[int, ...]]:
+        """
+        Find k entries, at different indexes, summing to sum_to_check
+
+        :param sum_to_check: Value to check for
+        :param k: Number of values in the combination
+        :return: Matching items or None
+        """
+        return self.query([sum_to_check], k)[sum_to_check]
+
+    def query(self, sums_to_check: Iterable[int], k: int) -> Dict[int, Optional[Tuple]]:
+        """
+        Answer a batch of k-sum queries
+
+        :param sums_to_check: Values to check for
+        :param k: Number of values in the combination
+        :return: Value to matching items, or None
+        """
+        sums_to_check = list(sums_to_check)
+        pair_sums = self.pair_sums if k <= 3 else None
+        if k == 1:
+            results = [
+                (sum_to_check,) if sum_to_check in self.counts else None
+                for sum_to_check in sums_to_check
+            ]
+        elif pair_sums is None:
+            results = [
+                find_sorted_k_sum(self.sorted_data, sum_to_check, k)
+                for sum_to_check in sums_to_check
+            ]
+        else:
+            targets = np.array(sums_to_check, dtype=np.int64)
+            if k == 2:
+                results = self.query_pairs(targets)
+            else:
+                results = self.query_triples(targets)
+        return dict(zip(sums_to_check, results))
+
+    def query_pairs(self, targets: np.ndarray) -> List[Optional[Tuple[int, int]]]:
+        sums, firsts, seconds = self.pair_sums
+        if not len(sums):
+            return [None] * len(targets)
+
+        positions = np.searchsorted(sums, targets).clip(max=len(sums) - 1)
+        found = (sums[positions] == targets).tolist()
+        pairs = np.stack(
+            (self.values[firsts[positions]], self.values[seconds[positions]]), axis=1
+        ).tolist()
+        return [
+            tuple(pair) if is_found else None for pair, is_found in zip(pairs, found)
+        ]
+
+    def query_triples(self, targets: np.ndarray) -> List[Optional[Tuple[int, ...]]]:
+        """
+        For every target and value, look up the pairs summing to the remainder.
+
+        At most one pair of a given sum holds a given value, so when the first pair
+        of the remainder reuses the value too often, the next one does not.
+        """
+        sums, firsts, seconds = self.pair_sums
+        results = [None] * len(targets)
+        if not len(sums):
+            return results
+
+        size = len(self.values)
+        value_indexes = np.arange(size)[:, None]
+        block_size = max(1, SUM_INDEX_BLOCK_SIZE // size)
+        for start in range(0, len(targets), block_size):
+            block_targets = targets[None, start : start + block_size]
+            remainders = block_targets - self.values[:, None]
+            low = np.searchsorted(sums, remainders, side="left")
+            high = np.searchsorted(sums, remainders, side="right")
+
+            candidates = low.clip(max=len(sums) - 1)
+            uses = (firsts[candidates] == value_indexes).astype(np.int64) + (
+                seconds[candidates] == value_indexes
+            )
+            available = self.value_counts[:, None] > uses
+            # Fall back on the next pair of the same sum
+            candidates = np.where(available, candidates, low + 1).clip(
+                max=len(sums) - 1
+            )
+            valid = (high > low) & (available | (high - low >= 2))
+
+            has_triple = valid.any(axis=0)
+            rows = valid.argmax(axis=0)
+            columns = np.arange(valid.shape[1])
+            pair_indexes = candidates[rows, columns]
+            triples = np.stack(
+                (
+                    self.values[rows],
+                    self.values[firsts[pair_indexes]],
+                    self.values[seconds[pair_indexes]],
+                ),
+                axis=1,
+            ).tolist()
+            for column in np.flatnonzero(has_triple).tolist():
+                results[start + column] = tuple(triples[column])
+
+        return results
+
+    def query_products(
+        self, sums_to_check: Iterable[int], k: int
+    ) -> Dict[int, Optional[int]]:
+        """
+        Answer a batch of k-sum queries with the product of the matching items
+
+        :param sums_to_check: Values to check for
+        :param k: Number of values in the combination
+        :return: Value to product of the matching items, or None
+        """
+        return {
+            sum_to_check: None if values is None else multiply(values)
+            for sum_to_check, values in self.query(sums_to_check, k).items()
+        }
+
+
+def main(input_directory: str = INPUT_DIRECTORY) -> None:
+    """
+    Solve both parts of the day for each data source.
+
+    :param input_directory: Directory holding the input files
+    """
+    with phase("read"):
+        test_reader = OneColumnFileReader(join(input_directory, "input-test.txt"))
+        test_data = test_reader.cached_read(type_to_cast=int, compact=True)
+
+        reader = OneColumnFileReader(join(input_directory, "input.txt"))
+        prod_data = reader.cached_read(type_to_cast=int, compact=True)
 
-    product_data = [data for _ in range(number_of_elements_in_equation)]
+    data_sources = (("Test data", test_data), ("Prod data", prod_data))
 
-    combinations = list(itertools.product(*product_data))
-    for combination in combinations:
-        if sum(combination) == sum_to_check:
-            return combination
+    for data_source_name, data_source in data_sources:
+        with phase(f"{data_source_name} part 1"):
+            values = find_entry_sum_in_list(data_source, 2020, 2)
+        LOG.info(f"Day 0 result 1 - {data_source_name}: {multiply(values)}")
 
+        with phase(f"{data_source_name} part 2"):
+            values = find_entry_sum_in_list(data_source, 2020, 3)
+        LOG.info(f"Day 0 result 2 - {data_source_name}: {multiply(values)}")
 
-for data_source_name, data_source in data_sources:
-    values = find_entry_sum_in_list(data_source, 2020, 2)
-    LOG.info(f"Day 0 result 1 - {data_source_name}: {multiply(values)}")
 
-    values = find_entry_sum_in_list(data_source, 2020, 3)
-    LOG.info(f"Day 0 result 2 - {data_source_name}: {multiply(values)}")
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 import re
-from typing import List
-from collections import Counter
+from os.path import abspath, dirname, join
+from typing import List, Union
 
-from utils.log import LOG
-from utils.readers import FileReader
+from utils.log import LOG, phase
+from utils.passwords import PasswordDatabaseColumns, PasswordDatabaseColumnsReader
+
+INPUT_DIRECTORY = dirname(abspath(__file__))
 
 PASSWORD_DATABASE_LINE_REGEX = re.compile("(\d+)-(\d+) (\w): (\w+)")
 
@@ -41,7 +43,7 @@ class PasswordDatabaseConditions:
             return match_min ^ match_max
 
 
-class PasswordDatabaseReader(FileReader):
+class PasswordDatabaseReader(PasswordDatabaseColumnsReader):
     """
     Implementation of a password database file reader.
 
@@ -52,32 +54,17 @@ class PasswordDatabaseReader(FileReader):
     2-9 c: ccccccccc
     """
 
-    def read(self, *args, **kwargs) -> List:
+    def read(
+        self, *args, columns: bool = False, **kwargs
+    ) -> Union[List, PasswordDatabaseColumns]:
         """
         Implementation of a one column data file read function.
-        """
-        data = super(PasswordDatabaseReader, self).read()
-
-        result = []
-
-        for line in data.splitlines():
-            if line:
-                match = PASSWORD_DATABASE_LINE_REGEX.match(line)
-                if match is not None:
-                    result.append(match.groups())
-                else:
-                    raise Exception(f"Could not read database line {line}")
-
-        return result
 
-
-test_reader = PasswordDatabaseReader("input-test.txt")
-test_data = test_reader.read()
-
-reader = PasswordDatabaseReader("input.txt")
-prod_data = reader.read()
-
-data_sources = (("Test data", test_data), ("Prod data", prod_data))
+        :param columns: Return a PasswordDatabaseColumns instead of parsed lines
+        """
+        if columns:
+            return self.read_columns()
+        return self.parse_lines()
 
 
 def validate_database_line(
@@ -97,9 +84,30 @@ def validate_database_line(
     return condition.validate_password(password, old_rule=old_rule)
 
 
-for data_source_name, data_source in data_sources:
-    values = [validate_database_line(*line, old_rule=True) for line in data_source]
-    LOG.info(f"Day 0 result 1 - {data_source_name}: {Counter(values)[True]}")
+def main(input_directory: str = INPUT_DIRECTORY) -> None:
+    """
+    Solve both parts of the day for each data source.
+
+    :param input_directory: Directory holding the input files
+    """
+    with phase("read"):
+        test_reader = PasswordDatabaseReader(join(input_directory, "input-test.txt"))
+        test_data = test_reader.cached_read(columns=True)
+
+        reader = PasswordDatabaseReader(join(input_directory, "input.txt"))
+        prod_data = reader.cached_read(columns=True)
+
+    data_sources = (("Test data", test_data), ("Prod data", prod_data))
+
+    for data_source_name, data_source in data_sources:
+        with phase(f"{data_source_name} part 1"):
+            valid_count = data_source.count_valid_passwords(old_rule=True)
+        LOG.info(f"Day 0 result 1 - {data_source_name}: {valid_count}")
+
+        with phase(f"{data_source_name} part 2"):
+            valid_count = data_source.count_valid_passwords()
+        LOG.info(f"Day 0 result 2 - {data_source_name}: {valid_count}\n")
+
 
-    values = [validate_database_line(*line) for line in data_source]
-    LOG.info(f"Day 0 result 2 - {data_source_name}: {Counter(values)[True]}\n")
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,83 @@
-from typing import List
+from os.path import abspath, dirname, join
+from typing import List, Sequence, Tuple, Union, Iterable
 
-from utils.log import LOG
+import numpy as np
+
+from utils.log import LOG, phase
 from utils.math import multiply
 from utils.readers import FileReader
 
+INPUT_DIRECTORY = dirname(abspath(__file__))
+
+TREE = ord("#")
+# Maximum number of cells gathered at once by GeologyMap.count_trees
+SWEEP_BATCH_SIZE = 1 << 22
+
+
+class GeologyMap:
+    """
+    Bitmap representation of a geology map, True where a tree stands.
+
+    The map repeats itself to the right.
+    """
+
+    trees = None
+
+    def __init__(self, trees: np.ndarray) -> None:
+        self.trees = trees
+
+    @property
+    def height(self) -> int:
+        return self.trees.shape[0]
+
+    @property
+    def width(self) -> int:
+        return self.trees.shape[1]
+
+    def count_trees(
+        self,
+        vectors: Sequence[Tuple[int, int]],
+        starting_point: Tuple[int, int] = (0, 0),
+    ) -> np.ndarray:
+        """
+        Count the trees impacted along each slope, all slopes at once.
+
+        The positions of every slope are computed with index arithmetic and gathered
+        from the bitmap in batches of about SWEEP_BATCH_SIZE cells.
+
+        :param vectors: Y, X vectors, Y strictly positive
+        :param starting_point: Starting point coordinates
+        :return: Number of trees impacted per vector
+        """
+        vectors = np.asarray(vectors, dtype=np.int64).reshape(-1, 2)
+        start_y, start_x = starting_point
+        steps = np.maximum((self.height - 1 - start_y) // vectors[:, 0] + 1, 0)
+        counts = np.zeros(len(vectors), dtype=np.int64)
+
+        batch_start = 0
+        while batch_start < len(vectors):
+            # Take at least one slope, then as many as the batch size allows
+            batch_end = batch_start + 1 + np.searchsorted(
+                np.cumsum(steps[batch_start + 1 :]),
+                SWEEP_BATCH_SIZE - steps[batch_start],
+                side="right",
+            )
+            batch_steps = steps[batch_start:batch_end]
+            batch_vectors = vectors[batch_start:batch_end]
+
+            slope_ids = np.repeat(np.arange(len(batch_steps)), batch_steps)
+            first_cells = np.cumsum(batch_steps) - batch_steps
+            step = np.arange(len(slope_ids)) - first_cells[slope_ids]
+            ys = start_y + step * batch_vectors[slope_ids, 0]
+            xs = (start_x + step * batch_vectors[slope_ids, 1]) % self.width
+
+            counts[batch_start:batch_end] = np.bincount(
+                slope_ids, weights=self.trees[ys, xs], minlength=len(batch_steps)
+            )
+            batch_start = batch_end
+
+        return counts
+
 
 class GeologyMapReader(FileReader):
     """
@@ -24,21 +98,28 @@ class GeologyMapReader(FileReader):
     .#..#...#.#
     """
 
-    def read(self, *args, **kwargs) -> List[str]:
+    def read(
+        self, *args, bitmap: bool = False, **kwargs
+    ) -> Union[List[str], GeologyMap]:
         """
         Implementation of a geology map file read function.
-        """
-        data = super(GeologyMapReader, self).read()
-        return [line for line in data.splitlines() if line]
 
+        :param bitmap: Return a GeologyMap bitmap instead of the lines
+        """
+        if bitmap:
+            return self.read_bitmap()
+        return self.parse_lines()
 
-test_reader = GeologyMapReader("input-test.txt")
-test_data = test_reader.read()
-
-reader = GeologyMapReader("input.txt")
-prod_data = reader.read()
+    def read_bitmap(self) -> GeologyMap:
+        """
+        Read the map into a boolean matrix.
+        """
+        rows = self.read_lines(binary=True)
+        width = len(rows[0])
+        assert all(len(row) == width for row in rows), "Map rows must have same width"
 
-data_sources = (("Test data", test_data), ("Prod data", prod_data))
+        cells = np.frombuffer(b"".join(rows), dtype=np.uint8)
+        return GeologyMap(cells.reshape(len(rows), width) == TREE)
 
 
 def traverse_map(map_data: List[str], starting_point: List[int], vector: List[int]):
@@ -56,15 +137,12 @@ def traverse_map(map_data: List[str], starting_point: List[int], vector: List[in
     current_point = starting_point
     tree_impacted = 0
 
-    # Use the y vector to determine the number of steps needed to traverse the map
-    for _ in range(int(max_y / vector[0]) + 1):
+    # Use the y vector to determine the number of steps needed to traverse the map,
+    # the last step lands on or above the last row
+    for _ in range((max_y - 1 - starting_point[0]) // vector[0] + 1):
         if not first:
-            # Ensure the y vector won't step out of bounds
             current_x = (current_point[1] + vector[1]) % max_x
-            if current_point[0] + vector[0] >= max_y:
-                current_point = [max_y - 1, current_x]
-            else:
-                current_point = [current_point[0] + vector[0], current_x]
+            current_point = [current_point[0] + vector[0], current_x]
 
         if map_data[current_point[0]][current_point[1]] == "#":
             tree_impacted += 1
@@ -74,20 +152,80 @@ def traverse_map(map_data: List[str], starting_point: List[int], vector: List[in
     return tree_impacted
 
 
-for data_source_name, data_source in data_sources:
-    tree_impacted = traverse_map(data_source, [0, 0], [1, 3])
-    LOG.info(f"Day 0 result 1 - {data_source_name}: {tree_impacted}")
+def traverse_map_stream(
+    rows: Iterable[Union[str, bytes]],
+    vectors: Sequence[Tuple[int, int]],
+    starting_point: Tuple[int, int] = (0, 0),
+) -> List[int]:
+    """
+    Traverse a map for several descent vectors at once, in a single pass over rows
+    consumed one at a time, e.g. from GeologyMapReader.iter_lines.
+
+    Only a cursor per vector is kept, the vectors are bucketed by the next row they
+    land on so each row only costs the vectors landing on it.
+
+    :param rows: Map rows, str or bytes
+    :param vectors: Y, X vectors, Y strictly positive
+    :param starting_point: Starting point coordinates
+    :return: Number of tree impacted per vector
+    """
+    start_y, start_x = starting_point
+    tree_impacted = [0] * len(vectors)
+    current_x = [start_x] * len(vectors)
+    # Next row index to vector indexes landing on it
+    pending = {start_y: list(range(len(vectors)))}
+
+    for y, row in enumerate(rows):
+        landing = pending.pop(y, None)
+        if landing is None:
+            continue
+
+        tree = TREE if isinstance(row, bytes) else "#"
+        width = len(row)
+        for index in landing:
+            dy, dx = vectors[index]
+            if row[current_x[index] % width] == tree:
+                tree_impacted[index] += 1
+            current_x[index] += dx
+            pending.setdefault(y + dy, []).append(index)
+
+    return tree_impacted
+
+
+def main(input_directory: str = INPUT_DIRECTORY) -> None:
+    """
+    Solve both parts of the day for each data source.
+
+    :param input_directory: Directory holding the input files
+    """
+    with phase("read"):
+        test_reader = GeologyMapReader(join(input_directory, "input-test.txt"))
+        test_data = test_reader.cached_read(bitmap=True)
+
+        reader = GeologyMapReader(join(input_directory, "input.txt"))
+        prod_data = reader.cached_read(bitmap=True)
+
+    data_sources = (("Test data", test_data), ("Prod data", prod_data))
+
+    for data_source_name, data_source in data_sources:
+        with phase(f"{data_source_name} part 1"):
+            (tree_impacted,) = data_source.count_trees([(1, 3)])
+        LOG.info(f"Day 0 result 1 - {data_source_name}: {tree_impacted}")
+
+        slope_vectors = [
+            [1, 1],
+            [1, 3],
+            [1, 5],
+            [1, 7],
+            [2, 1],
+        ]
+        with phase(f"{data_source_name} part 2"):
+            slopes_results = data_source.count_trees(slope_vectors)
+
+        LOG.info(
+            f"Day 0 result 2 - {data_source_name}: {multiply(slopes_results.tolist())}"
+        )
 
-    slope_vectors = [
-        [1, 1],
-        [1, 3],
-        [1, 5],
-        [1, 7],
-        [2, 1],
-    ]
-    slopes_results = []
-    for slope_vector in slope_vectors:
-        tree_impacted = traverse_map(data_source, [0, 0], slope_vector)
-        slopes_results.append(tree_impacted)
 
-    LOG.info(f"Day 0 result 2 - {data_source_name}: {multiply(slopes_results)}")
+if __name__ == "__main__":
+    main()
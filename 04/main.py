@@ -1,8 +1,11 @@
 import re
-from typing import List
+from os.path import abspath, dirname, join
+from typing import List, Union, Callable, Iterator
 
-from utils.log import LOG
-from utils.readers import FileReader
+from utils.log import LOG, phase
+from utils.readers import FileReader, RECORD_SEPARATOR
+
+INPUT_DIRECTORY = dirname(abspath(__file__))
 
 HEIGHT_REGEX = re.compile(r"(\d+)(in|cm)")
 HAIR_COLOR_REGEX = re.compile(r"#[0-9a-f]{6}")
@@ -21,32 +24,22 @@ class PassportBatchReader(FileReader):
     hcl:#cfa07d byr:1929
     """
 
-    def read(self, *args, **kwargs) -> List[List[str]]:
+    def read(self, *args, raw: bool = False, **kwargs) -> Union[List[List[str]], str]:
         """
         Implementation of a Passport batch file read function.
-        """
-        data = super(PassportBatchReader, self).read()
-
-        # Split passport per passport
-        passport_raw_data = [
-            line.replace("\n", " ") for line in data.split("\n\n") if line
-        ]
-
-        # Split each passport components
-        passport_raw_split_data = [
-            passport.split(" ") for passport in passport_raw_data
-        ]
-
-        return passport_raw_split_data
-
-
-test_reader = PassportBatchReader("input-test.txt")
-test_data = test_reader.read()
 
-reader = PassportBatchReader("input.txt")
-prod_data = reader.read()
+        :param raw: Return the unsplit file content, see compile_passport_schema
+        """
+        if raw:
+            return super(PassportBatchReader, self).read()
+        return list(self.iter_read())
 
-data_sources = (("Test data", test_data), ("Prod data", prod_data))
+    def iter_read(self, *args, **kwargs) -> Iterator[List[str]]:
+        """
+        Lazily yield the components of each passport.
+        """
+        for passport_raw_data in self.iter_records():
+            yield passport_raw_data.split()
 
 
 # Validators
@@ -182,7 +175,113 @@ def validate_raw_passports(raw_passports: List[List[str]], compulsory: dict):
     return valid_count
 
 
-for data_source_name, data_source in data_sources:
+# Regex equivalents of the validators, as (valid, invalid) value patterns: values
+# matching the first one are accepted by the validator, values matching the second
+# one are rejected, any other value is checked by the validator itself. Patterns
+# must not capture, nor match whitespaces or colons.
+VALIDATOR_PATTERNS = {
+    no_validation: (r"[^\s:]*", None),
+    validate_byr: (r"\+?0*(?:19[2-9][0-9]|200[0-2])", r"[+-]?[0-9]+"),
+    validate_iyr: (r"\+?0*(?:201[0-9]|2020)", r"[+-]?[0-9]+"),
+    validate_eyr: (r"\+?0*(?:202[0-9]|2030)", r"[+-]?[0-9]+"),
+    validate_hgt: (
+        r"0*(?:1[5-8][0-9]|19[0-3])cm[^\s:]*|0*(?:59|6[0-9]|7[0-6])in[^\s:]*",
+        # Leading ASCII digits not followed by any other digit
+        r"[0-9]*(?!\d)[^\s:]*",
+    ),
+    validate_hcl: (r"#[0-9a-f]{6}[^\s:]*", r"[^\s:]*"),
+    validate_ecl: (r"amb|blu|brn|gry|grn|hzl|oth", r"[^\s:]*"),
+    # Printable ASCII but colons, non ASCII digits are decimals too
+    validate_pid: (r"[0-9]{9}", r"[!-9;-~]*"),
+}
+
+
+def compile_passport_schema(compulsory: dict) -> Callable[[str], int]:
+    """
+    Compile a compulsory dict, as used by validate_raw_passports, into a function
+    counting the valid passports of a raw passport batch in a single pass.
+
+    Passports are split one at a time out of the raw data, each one being tracked as
+    a bitmask of the compulsory fields whose last value is valid, no per passport
+    dict is built. Components are classified by a single regex built from
+    VALIDATOR_PATTERNS, the ones it cannot decide are split and checked like
+    validate_raw_passports does, so that both functions always agree.
+
+    :param compulsory: dict of compulsory check alongside validation checks
+    :return: Function counting the valid passports of a raw batch
+    """
+    fields = list(compulsory)
+    field_bits = {field: 1 << index for index, field in enumerate(fields)}
+    required_mask = (1 << len(fields)) - 1
+
+    # Bits set then kept by the mask for each regex group
+    patterns = []
+    set_bits = [0]
+    keep_masks = [-1]
+    for field in fields:
+        valid_pattern, invalid_pattern = VALIDATOR_PATTERNS.get(
+            compulsory[field], (None, None)
+        )
+        for pattern, set_bit, keep_mask in (
+            (valid_pattern, field_bits[field], -1),
+            (invalid_pattern, 0, ~field_bits[field]),
+        ):
+            if pattern is not None:
+                patterns.append(f"{re.escape(field)}:({pattern})")
+                set_bits.append(set_bit)
+                keep_masks.append(keep_mask)
+    # Other fields are ignored
+    fields_pattern = "|".join(map(re.escape, fields))
+    patterns.append(f"(?!(?:{fields_pattern}):)([^\\s:]*):[^\\s:]*")
+    set_bits.append(0)
+    keep_masks.append(-1)
+    match_component = re.compile("|".join(patterns)).fullmatch
+
+    def count_valid_passports(data: str) -> int:
+        valid_count = 0
+        start = 0
+        while start < len(data):
+            end = data.find(RECORD_SEPARATOR, start)
+            if end < 0:
+                end = len(data)
+
+            passport_mask = 0
+            for component in data[start:end].split():
+                match = match_component(component)
+                if match is not None:
+                    group = match.lastindex
+                    passport_mask |= set_bits[group]
+                    passport_mask &= keep_masks[group]
+                    continue
+                field, value = component.split(":")
+                if field in field_bits:
+                    if compulsory[field](value):
+                        passport_mask |= field_bits[field]
+                    else:
+                        passport_mask &= ~field_bits[field]
+
+            valid_count += passport_mask == required_mask
+            start = end + len(RECORD_SEPARATOR)
+        return valid_count
+
+    return count_valid_passports
+
+
+def main(input_directory: str = INPUT_DIRECTORY) -> None:
+    """
+    Solve both parts of the day for each data source.
+
+    :param input_directory: Directory holding the input files
+    """
+    with phase("read"):
+        test_reader = PassportBatchReader(join(input_directory, "input-test.txt"))
+        test_data = test_reader.cached_read(raw=True)
+
+        reader = PassportBatchReader(join(input_directory, "input.txt"))
+        prod_data = reader.cached_read(raw=True)
+
+    data_sources = (("Test data", test_data), ("Prod data", prod_data))
+
     compulsory_1 = {
         "byr": no_validation,
         "iyr": no_validation,
@@ -192,10 +291,7 @@ for data_source_name, data_source in data_sources:
         "ecl": no_validation,
         "pid": no_validation,
     }
-
-    LOG.info(
-        f"Day 04 result 1 - {data_source_name}: {validate_raw_passports(data_source, compulsory_1)}"
-    )
+    count_valid_passports_1 = compile_passport_schema(compulsory_1)
 
     compulsory_2 = {
         "byr": validate_byr,
@@ -206,6 +302,17 @@ for data_source_name, data_source in data_sources:
         "ecl": validate_ecl,
         "pid": validate_pid,
     }
-    LOG.info(
-        f"Day 04 result 2 - {data_source_name}: {validate_raw_passports(data_source, compulsory_2)}"
-    )
+    count_valid_passports_2 = compile_passport_schema(compulsory_2)
+
+    for data_source_name, data_source in data_sources:
+        with phase(f"{data_source_name} part 1"):
+            valid_count = count_valid_passports_1(data_source)
+        LOG.info(f"Day 04 result 1 - {data_source_name}: {valid_count}")
+
+        with phase(f"{data_source_name} part 2"):
+            valid_count = count_valid_passports_2(data_source)
+        LOG.info(f"Day 04 result 2 - {data_source_name}: {valid_count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,76 @@
-from typing import Tuple, List
+from os.path import abspath, dirname, join
+from typing import Tuple, List, Iterable, Optional
 from math import ceil, floor
 
-from pandas import np
+import numpy as np
 
-from utils.log import LOG
+from utils.log import LOG, phase
 from utils.readers import OneColumnFileReader
 
+INPUT_DIRECTORY = dirname(abspath(__file__))
+
 PLANE_ROW_NUMBER = 128
 PLANE_COLUMN_NUMBER = 8
 
-test_reader = OneColumnFileReader("input-test.txt")
-test_data = test_reader.read()
+# A boarding pass is a binary number, B & R being the 1 bits
+BOARDING_PASS_TRANSLATION = str.maketrans("FBLR", "0101")
+BOARDING_PASS_ROW_LETTERS = np.frombuffer(b"FB", dtype=np.uint8)
+BOARDING_PASS_COLUMN_LETTERS = np.frombuffer(b"LR", dtype=np.uint8)
+BOARDING_PASS_ONE_BITS = np.frombuffer(b"BR", dtype=np.uint8)
+
+
+class PlaneGeometry:
+    """
+    Representation of a plane seats layout, 2^row_bits rows of 2^column_bits seats.
+
+    A boarding pass holds row_bits F/B letters followed by column_bits L/R letters.
+    """
+
+    row_bits = None
+    column_bits = None
+
+    def __init__(self, row_bits: int, column_bits: int) -> None:
+        self.row_bits = row_bits
+        self.column_bits = column_bits
 
-reader = OneColumnFileReader("input.txt")
-prod_data = reader.read()
+    @classmethod
+    def from_boarding_pass(cls, boarding_pass: str) -> "PlaneGeometry":
+        """
+        Infer the geometry from the code length of a boarding pass
 
-data_sources = (
-    ("Test data", test_data),
-    ("Prod data", prod_data),
-)
+        :param boarding_pass: Boarding pass
+        :return: Plane geometry
+        """
+        column_bits = len(boarding_pass.lstrip("FB"))
+        return cls(len(boarding_pass) - column_bits, column_bits)
 
+    @property
+    def row_number(self) -> int:
+        return 1 << self.row_bits
 
-def get_seat_id(row: int, column: int) -> int:
+    @property
+    def column_number(self) -> int:
+        return 1 << self.column_bits
+
+    @property
+    def seat_number(self) -> int:
+        return 1 << (self.row_bits + self.column_bits)
+
+    def get_seat_id(self, row: int, column: int) -> int:
+        return (row << self.column_bits) | column
+
+    def get_seat_coordinates(self, seat_id: int) -> Tuple[int, int]:
+        return seat_id >> self.column_bits, seat_id & (self.column_number - 1)
+
+
+DEFAULT_PLANE_GEOMETRY = PlaneGeometry(7, 3)
+
+
+def get_seat_id(row: int, column: int, column_number: int = PLANE_COLUMN_NUMBER) -> int:
     """
     Given a seat coordinates, calculate its seat id
     """
-    return row * 8 + column
+    return row * column_number + column
 
 
 def dichotomic_split(lower: int, upper: int, code: str):
@@ -63,16 +108,21 @@ def decode_boarding_pass_component(boarding_pass_component: str, max_upper: int)
     return current_lower
 
 
-def decode_boarding_pass(boarding_pass: str) -> Tuple[int, int, int]:
+def decode_boarding_pass(
+    boarding_pass: str, geometry: PlaneGeometry = DEFAULT_PLANE_GEOMETRY
+) -> Tuple[int, int, int]:
     """
     Decode both boarding pass parts.
 
     :param boarding_pass: Boarding path
+    :param geometry: Plane geometry
     :return: row, column, seat_id
     """
-    row = decode_boarding_pass_component(boarding_pass[:7], PLANE_ROW_NUMBER)
-    column = decode_boarding_pass_component(boarding_pass[7:], PLANE_COLUMN_NUMBER)
-    seat_id = get_seat_id(row, column)
+    row_code = boarding_pass[: geometry.row_bits]
+    column_code = boarding_pass[geometry.row_bits :]
+    row = decode_boarding_pass_component(row_code, geometry.row_number)
+    column = decode_boarding_pass_component(column_code, geometry.column_number)
+    seat_id = get_seat_id(row, column, geometry.column_number)
 
     return row, column, seat_id
 
@@ -140,22 +190,361 @@ def find_missing_seat(seats_data: List[Tuple[int, int]]) -> Tuple[int, int]:
             return empty_seat
 
 
-for data_source_name, data_source in data_sources:
-    seats_data = []
-    seats_data_without_seat_id = []
-    for boarding_pass in data_source:
-        current_seat_data = decode_boarding_pass(boarding_pass)
-        seats_data.append(current_seat_data)
-        seats_data_without_seat_id.append(current_seat_data[:2])
+def decode_boarding_pass_id(boarding_pass: str) -> int:
+    """
+    Decode a boarding pass seat id, reading the pass as a binary number.
+
+    :param boarding_pass: Boarding pass
+    :return: Seat id
+    """
+    return int(boarding_pass.translate(BOARDING_PASS_TRANSLATION), 2)
+
+
+def decode_boarding_passes(
+    boarding_passes: Iterable[str], geometry: Optional[PlaneGeometry] = None
+) -> np.ndarray:
+    """
+    Decode a batch of boarding passes seat ids at once.
+
+    :param boarding_passes: Boarding passes
+    :param geometry: Plane geometry, inferred from the first boarding pass by default
+    :return: Seat ids
+    """
+    boarding_passes = list(boarding_passes)
+    if not boarding_passes:
+        return np.zeros(0, dtype=np.int64)
+
+    if geometry is None:
+        geometry = PlaneGeometry.from_boarding_pass(boarding_passes[0])
+    length = geometry.row_bits + geometry.column_bits
+    for boarding_pass in boarding_passes:
+        if len(boarding_pass) != length:
+            raise Exception(
+                f"Boarding pass {boarding_pass} is not {length} characters long"
+            )
+
+    codes = np.frombuffer("".join(boarding_passes).encode(), dtype=np.uint8)
+    if len(codes) != length * len(boarding_passes):
+        raise Exception("Boarding passes must only hold F, B, L & R letters")
+    codes = codes.reshape(-1, length)
+
+    row_codes = codes[:, : geometry.row_bits]
+    column_codes = codes[:, geometry.row_bits :]
+    valid = np.isin(row_codes, BOARDING_PASS_ROW_LETTERS).all(axis=1) & np.isin(
+        column_codes, BOARDING_PASS_COLUMN_LETTERS
+    ).all(axis=1)
+    if not valid.all():
+        boarding_pass = boarding_passes[int(np.argmin(valid))]
+        raise Exception(
+            f"Boarding pass {boarding_pass} is not {geometry.row_bits} F/B letters "
+            f"followed by {geometry.column_bits} L/R letters"
+        )
+
+    bits = np.isin(codes, BOARDING_PASS_ONE_BITS)
+    weights = 1 << np.arange(length - 1, -1, -1, dtype=np.int64)
+    return bits @ weights
+
+
+def find_missing_seat_id(seat_ids: Iterable[int]) -> Optional[int]:
+    """
+    Given the taken seat ids, return the only free one between the lowest and the
+    highest, in O(n) with no seat matrix.
+
+    :param seat_ids: Occupied seat ids
+    :return: Missing seat id, None if there is not exactly one or ids are repeated
+    """
+    seat_ids = np.asarray(seat_ids, dtype=np.int64)
+    if not len(seat_ids):
+        return None
+
+    # One free seat leaves room for exactly one more id between the bounds
+    lowest = int(seat_ids.min())
+    if int(seat_ids.max()) - lowest != len(seat_ids):
+        return None
+
+    taken = np.zeros(len(seat_ids) + 1, dtype=bool)
+    taken[seat_ids - lowest] = True
+    free_seats = np.flatnonzero(~taken)
+    # Repeated ids leave more than one seat free
+    if len(free_seats) != 1:
+        return None
+    return lowest + int(free_seats[0])
 
-    LOG.info(
-        f"Day 05 result 1 - {data_source_name}: {max(seats_data, key=lambda x:x[2])} "
+
+WORD_BITS = 64
+
+
+class SummaryBitset:
+    """
+    Bitset with a summary tree: every level holds one bit per word of the level
+    below, set when that word is not empty. Updates and successor queries walk one
+    word per level, i.e. O(log_64 n).
+    """
+
+    size = None
+    levels = None
+
+    def __init__(self, size: int, fill: bool = False) -> None:
+        self.size = size
+        self.levels = []
+        level_size = size
+        while True:
+            word_number = -(-level_size // WORD_BITS)
+            if fill:
+                words = [(1 << WORD_BITS) - 1] * word_number
+                if level_size % WORD_BITS:
+                    words[-1] = (1 << (level_size % WORD_BITS)) - 1
+            else:
+                words = [0] * word_number
+            self.levels.append(words)
+            if word_number <= 1:
+                break
+            level_size = word_number
+
+    @classmethod
+    def from_indexes(cls, size: int, indexes: Iterable[int]) -> "SummaryBitset":
+        """
+        Build a bitset from its set indexes, setting the bits of each level at once.
+
+        :param size: Bitset size
+        :param indexes: Set indexes
+        :return: Bitset
+        """
+        bitset = cls(size)
+        indexes = np.asarray(indexes, dtype=np.int64)
+        if len(indexes) and (indexes.min() < 0 or indexes.max() >= size):
+            raise Exception(f"Bitset indexes must be between 0 and {size - 1}")
+
+        for words in bitset.levels:
+            level = np.zeros(len(words), dtype=np.uint64)
+            bits = np.uint64(1) << (indexes % WORD_BITS).astype(np.uint64)
+            np.bitwise_or.at(level, indexes // WORD_BITS, bits)
+            words[:] = level.tolist()
+            indexes = np.flatnonzero(level)
+        return bitset
+
+    def __contains__(self, index: int) -> bool:
+        word, bit = divmod(index, WORD_BITS)
+        return bool((self.levels[0][word] >> bit) & 1)
+
+    def add(self, index: int) -> None:
+        for words in self.levels:
+            word, bit = divmod(index, WORD_BITS)
+            was_empty = not words[word]
+            words[word] |= 1 << bit
+            if not was_empty:
+                break
+            index = word
+
+    def discard(self, index: int) -> None:
+        for words in self.levels:
+            word, bit = divmod(index, WORD_BITS)
+            words[word] &= ~(1 << bit)
+            if words[word]:
+                break
+            index = word
+
+    def next_set(self, index: int) -> Optional[int]:
+        """
+        Smallest set index greater or equal to index
+
+        :param index: Lower bound
+        :return: Set index, None if there is none
+        """
+        if index >= self.size:
+            return None
+
+        # Climb until a word holds a set bit at or after the position
+        for depth, words in enumerate(self.levels):
+            word, bit = divmod(index, WORD_BITS)
+            if word >= len(words):
+                return None
+            remaining = words[word] >> bit << bit
+            if remaining:
+                break
+            index = word + 1
+        else:
+            return None
+
+        # Then descend along the lowest set bits
+        index = word * WORD_BITS + (remaining & -remaining).bit_length() - 1
+        for words in reversed(self.levels[:depth]):
+            lowest = words[index] & -words[index]
+            index = index * WORD_BITS + lowest.bit_length() - 1
+        return index
+
+    def last_set(self) -> Optional[int]:
+        """
+        Largest set index
+
+        :return: Set index, None if the bitset is empty
+        """
+        if not self.size:
+            return None
+
+        index = 0
+        for words in reversed(self.levels):
+            if not words[index]:
+                return None
+            index = index * WORD_BITS + words[index].bit_length() - 1
+        return index
+
+    def get_indexes(self) -> np.ndarray:
+        """
+        Expand the bitset into its sorted set indexes, in a single pass over its words
+
+        :return: Set indexes
+        """
+        words = np.array(self.levels[0], dtype=np.uint64).astype("<u8")
+        bits = np.unpackbits(words.view(np.uint8), bitorder="little")
+        return np.flatnonzero(bits)
+
+
+class SeatOccupancy:
+    """
+    Occupancy of a plane seats, held as a SummaryBitset indexed by seat id, a bit
+    being set when the seat is taken.
+    """
+
+    geometry = None
+    occupied = None
+
+    def __init__(self, geometry: PlaneGeometry, seat_ids: Iterable[int]) -> None:
+        self.geometry = geometry
+        self.occupied = SummaryBitset.from_indexes(geometry.seat_number, seat_ids)
+
+    @classmethod
+    def from_boarding_passes(cls, boarding_passes: List[str]) -> "SeatOccupancy":
+        """
+        Build the occupancy of a plane, its geometry given by the passes code length
+
+        :param boarding_passes: Boarding passes
+        :return: Seat occupancy
+        """
+        geometry = PlaneGeometry.from_boarding_pass(boarding_passes[0])
+        return cls(geometry, decode_boarding_passes(boarding_passes, geometry))
+
+    def is_free(self, seat_id: int) -> bool:
+        return seat_id not in self.occupied
+
+    def find_free_runs(self, length: int = 1) -> np.ndarray:
+        """
+        Find the runs of exactly `length` free seats with a taken seat on both sides.
+
+        Such a run lies between two consecutive taken seats: the bitset is expanded
+        once into the sorted taken seat ids, then a single pass over their gaps finds
+        the runs, whatever their length.
+
+        :param length: Run length
+        :return: First seat id of each run
+        """
+        occupied = self.occupied.get_indexes()
+        return occupied[:-1][np.diff(occupied) == length + 1] + 1
+
+    def find_isolated_free_seats(self) -> np.ndarray:
+        """
+        Find the free seats with both neighbouring seats taken
+        """
+        return self.find_free_runs(1)
+
+
+class SeatAllocationIndex:
+    """
+    Online seat allocation, boarding passes being assigned and released one at a time
+    while seats are queried, without rescanning the plane on every change.
+    """
+
+    geometry = None
+    free_seats = None
+    occupied_seats = None
+
+    def __init__(self, geometry: PlaneGeometry = DEFAULT_PLANE_GEOMETRY) -> None:
+        self.geometry = geometry
+        self.free_seats = SummaryBitset(geometry.seat_number, fill=True)
+        self.occupied_seats = SummaryBitset(geometry.seat_number)
+
+    def get_seat_id(self, boarding_pass: str) -> int:
+        return decode_boarding_pass(boarding_pass, self.geometry)[2]
+
+    def assign(self, boarding_pass: str) -> int:
+        """
+        Mark the seat of a boarding pass as taken
+
+        :param boarding_pass: Boarding pass
+        :return: Seat id
+        """
+        seat_id = self.get_seat_id(boarding_pass)
+        if seat_id in self.occupied_seats:
+            raise Exception(f"Seat {seat_id} of {boarding_pass} is already taken")
+        self.occupied_seats.add(seat_id)
+        self.free_seats.discard(seat_id)
+        return seat_id
+
+    def release(self, boarding_pass: str) -> int:
+        """
+        Free the seat of a boarding pass
+
+        :param boarding_pass: Boarding pass
+        :return: Seat id
+        """
+        seat_id = self.get_seat_id(boarding_pass)
+        if seat_id not in self.occupied_seats:
+            raise Exception(f"Seat {seat_id} of {boarding_pass} is not taken")
+        self.occupied_seats.discard(seat_id)
+        self.free_seats.add(seat_id)
+        return seat_id
+
+    def is_free(self, seat_id: int) -> bool:
+        return seat_id in self.free_seats
+
+    def next_free_seat(self, seat_id: int = 0) -> Optional[int]:
+        return self.free_seats.next_set(seat_id)
+
+    def last_occupied_seat(self) -> Optional[int]:
+        return self.occupied_seats.last_set()
+
+
+def main(input_directory: str = INPUT_DIRECTORY) -> None:
+    """
+    Solve both parts of the day for each data source.
+
+    :param input_directory: Directory holding the input files
+    """
+    with phase("read"):
+        test_reader = OneColumnFileReader(join(input_directory, "input-test.txt"))
+        test_data = test_reader.cached_read()
+
+        reader = OneColumnFileReader(join(input_directory, "input.txt"))
+        prod_data = reader.cached_read()
+
+    data_sources = (
+        ("Test data", test_data),
+        ("Prod data", prod_data),
     )
 
-    # Do not search the missing seat for test data
-    if data_source_name != "Test data":
-        missing_seat = find_missing_seat(seats_data_without_seat_id)
-        missing_seat_id = get_seat_id(*missing_seat)
-        LOG.info(
-            f"Day 05 result 2 - {data_source_name}: Seat {missing_seat}: {missing_seat_id}"
+    for data_source_name, data_source in data_sources:
+        with phase(f"{data_source_name} part 1"):
+            geometry = PlaneGeometry.from_boarding_pass(data_source[0])
+            seat_ids = decode_boarding_passes(data_source, geometry)
+            highest_seat_id = int(seat_ids.max())
+        highest_seat = geometry.get_seat_coordinates(highest_seat_id) + (
+            highest_seat_id,
         )
+
+        LOG.info(f"Day 05 result 1 - {data_source_name}: {highest_seat} ")
+
+        # Do not search the missing seat for test data
+        if data_source_name != "Test data":
+            with phase(f"{data_source_name} part 2"):
+                missing_seat_id = find_missing_seat_id(seat_ids)
+            if missing_seat_id is None:
+                LOG.info(f"Day 05 result 2 - {data_source_name}: No single free seat")
+                continue
+            missing_seat = geometry.get_seat_coordinates(missing_seat_id)
+            LOG.info(
+                f"Day 05 result 2 - {data_source_name}: Seat {missing_seat}: {missing_seat_id}"
+            )
+
+
+if __name__ == "__main__":
+    main()
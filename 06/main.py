@@ -1,9 +1,23 @@
+from os.path import abspath, dirname, join
 from collections import Counter
-from typing import List
+from functools import reduce
+from operator import and_, or_
+from typing import List, Iterator, Tuple, Union
 
-from utils.log import LOG
+import numpy as np
+
+from utils.log import LOG, phase
 from utils.readers import FileReader
 
+INPUT_DIRECTORY = dirname(abspath(__file__))
+
+# Answer masks, bit i standing for question chr(ord("a") + i)
+FIRST_QUESTION = ord("a")
+LAST_QUESTION = ord("z")
+NEWLINE = ord("\n")
+# Number of characters of the group batches given to count_answers_batch
+ANSWER_BATCH_SIZE = 1024 * 1024
+
 
 class CustomAnswerReader(FileReader):
     """
@@ -16,36 +30,42 @@ class CustomAnswerReader(FileReader):
     c
     """
 
-    def read(self, *args, **kwargs) -> List[List[str]]:
+    def read(self, *args, raw: bool = False, **kwargs) -> Union[List[List[str]], bytes]:
         """
         Implementation of a Custom answers file read function.
-        """
-        data = super(CustomAnswerReader, self).read()
 
-        result = []
-        # Split group per group
-        groups_answers_raw_data = [line for line in data.split("\n\n") if line]
-
-        # Split per person in group
-        for group_answers_raw_data in groups_answers_raw_data:
-            group_answers_per_person = [
-                line for line in group_answers_raw_data.split("\n") if line
-            ]
-            result.append(group_answers_per_person)
-
-        return result
+        :param raw: Return the unsplit file content, see count_answers_batch
+        """
+        if raw:
+            with open(self.file, "rb") as f:
+                return f.read()
+        return list(self.iter_read())
 
+    def iter_read(self, *args, **kwargs) -> Iterator[List[str]]:
+        """
+        Lazily yield the answers of each person, group per group.
+        """
+        for group_answers_raw_data in self.iter_records():
+            yield [line for line in group_answers_raw_data.split("\n") if line]
 
-test_reader = CustomAnswerReader("input-test.txt")
-test_data = test_reader.read()
+    def iter_batches(self, batch_size: int = ANSWER_BATCH_SIZE) -> Iterator[bytes]:
+        """
+        Lazily yield raw batches of whole groups, see count_answers_batch.
 
-reader = CustomAnswerReader("input.txt")
-prod_data = reader.read()
+        :param batch_size: Number of characters from which a batch is yielded
+        """
+        records = []
+        size = 0
+        for record in self.iter_records():
+            records.append(record)
+            size += len(record)
+            if size >= batch_size:
+                yield "\n\n".join(records).encode()
+                records = []
+                size = 0
 
-data_sources = (
-    ("Test data", test_data),
-    ("Prod data", prod_data),
-)
+        if records:
+            yield "\n\n".join(records).encode()
 
 
 def count_answers_in_group(answers: List[str]) -> Counter:
@@ -88,18 +108,110 @@ def count_unanimous_answers(answers_counter: Counter, nb_of_persons: int) -> int
     return count
 
 
-for data_source_name, data_source in data_sources:
-    group_unique_global_count = 0
-    group_unanimous_global_count = 0
-    for group in data_source:
-        answers_counter = count_answers_in_group(group)
+def encode_answers(answer: str) -> int:
+    """
+    Encode a person answers as a 26 bits mask
 
-        unique_answers_count = count_unique_answers(answers_counter)
-        unanimous_answers_count = count_unanimous_answers(answers_counter, len(group))
+    :param answer: Answered questions, e.g. "abc"
+    :return: Answers mask
+    """
+    mask = 0
+    for letter in answer:
+        mask |= 1 << (ord(letter) - FIRST_QUESTION)
+    return mask
 
-        group_unique_global_count += unique_answers_count
-        group_unanimous_global_count += unanimous_answers_count
 
-    LOG.info(f"Day 06 result 1 - {data_source_name}: {group_unique_global_count} ")
+def count_group_answers(answers: List[str]) -> Tuple[int, int]:
+    """
+    Count a group unique and unanimous answers from the union and the intersection
+    of its persons answers masks
+
+    :param answers: Group answers
+    :return: Number of unique answers, number of unanimous answers
+    """
+    masks = list(map(encode_answers, answers))
+    if not masks:
+        return 0, 0
+    return bin(reduce(or_, masks)).count("1"), bin(reduce(and_, masks)).count("1")
+
+
+def count_set_bits(masks: np.ndarray) -> int:
+    return int(np.unpackbits(masks.astype(np.uint32).view(np.uint8)).sum())
 
-    LOG.info(f"Day 06 result 2 - {data_source_name}: {group_unanimous_global_count} ")
+
+def count_answers_batch(data: bytes) -> Tuple[int, int]:
+    """
+    Count the unique and unanimous answers of all the groups of a raw answers file,
+    with array operations only: letters are turned into bits, OR-reduced per person,
+    then OR and AND-reduced per group. Scratch memory is several times the data
+    size, large files are better counted in batches, see
+    CustomAnswerReader.iter_batches.
+
+    :param data: Raw file content, or a batch of whole groups
+    :return: Sum of unique answers counts, sum of unanimous answers counts
+    """
+    codes = np.frombuffer(data, dtype=np.uint8)
+    newlines = codes == NEWLINE
+    is_letter = (codes >= FIRST_QUESTION) & (codes <= LAST_QUESTION)
+    if not is_letter.any():
+        return 0, 0
+
+    # Line of each letter, a line being a person
+    line_dtype = np.int32 if len(codes) < 2 ** 31 else np.int64
+    line_ids = (np.cumsum(newlines, dtype=line_dtype) - newlines)[is_letter]
+    bits = np.left_shift(1, codes[is_letter] - FIRST_QUESTION, dtype=np.uint32)
+    person_starts = np.flatnonzero(np.diff(line_ids, prepend=-1))
+    person_masks = np.bitwise_or.reduceat(bits, person_starts)
+    person_lines = line_ids[person_starts]
+
+    # Groups are separated by lines without any letter
+    empty_lines = np.ones(int(newlines.sum()) + 1, dtype=bool)
+    empty_lines[person_lines] = False
+    person_groups = np.cumsum(empty_lines)[person_lines]
+    group_starts = np.flatnonzero(np.diff(person_groups, prepend=-1))
+
+    unique_masks = np.bitwise_or.reduceat(person_masks, group_starts)
+    unanimous_masks = np.bitwise_and.reduceat(person_masks, group_starts)
+    return count_set_bits(unique_masks), count_set_bits(unanimous_masks)
+
+
+def main(input_directory: str = INPUT_DIRECTORY) -> None:
+    """
+    Solve both parts of the day for each data source.
+
+    :param input_directory: Directory holding the input files
+    """
+    test_reader = CustomAnswerReader(join(input_directory, "input-test.txt"))
+    reader = CustomAnswerReader(join(input_directory, "input.txt"))
+
+    # Groups are streamed from the files in bounded batches while counting
+    data_sources = (
+        ("Test data", test_reader.iter_batches()),
+        ("Prod data", reader.iter_batches()),
+    )
+
+    for data_source_name, data_source in data_sources:
+        group_unique_global_count = 0
+        group_unanimous_global_count = 0
+        while True:
+            with phase("read"):
+                batch = next(data_source, None)
+            if batch is None:
+                break
+
+            with phase(f"{data_source_name} parts 1 & 2"):
+                unique_answers_count, unanimous_answers_count = count_answers_batch(
+                    batch
+                )
+            group_unique_global_count += unique_answers_count
+            group_unanimous_global_count += unanimous_answers_count
+
+        LOG.info(f"Day 06 result 1 - {data_source_name}: {group_unique_global_count} ")
+
+        LOG.info(
+            f"Day 06 result 2 - {data_source_name}: {group_unanimous_global_count} "
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,14 @@
 import re
-from typing import List
+from os.path import abspath, dirname, join
+from typing import Dict, Iterable, List, Optional, Tuple
 
-import networkx as nx
+import numpy as np
 
-from utils.log import LOG
+from utils.log import LOG, phase
 from utils.readers import FileReader
 
+INPUT_DIRECTORY = dirname(abspath(__file__))
+
 BAGS_RULE_LINE_REGEX = re.compile(r"^(\w+ \w+) bags contain (.*).")
 BAGS_RULE_COMPONENT_REGEX = re.compile(r"(\d+) (\w+ \w+) bags?")
 
@@ -24,98 +27,643 @@ class BagRules(FileReader):
         """
         data = super(BagRules, self).read()
 
-        result = []
         # Split rules
         rules_raw = [line for line in data.split("\n") if line]
 
-        for rule_raw in rules_raw:
-            bag_color, content_raw = BAGS_RULE_LINE_REGEX.match(rule_raw).groups()
-            rule_parsed = {"bag_color": bag_color, "bag_rule_components": []}
-            if content_raw != "no other bags":
-                bag_rule_components = []
-                bag_rule_components_raw = content_raw.split(",")
-                for bag_rule_component_raw in bag_rule_components_raw:
-                    (
-                        rule_component_count,
-                        rule_component_color,
-                    ) = BAGS_RULE_COMPONENT_REGEX.match(
-                        bag_rule_component_raw.strip()
-                    ).groups()
-
-                    bag_rule_components.append(
-                        {
-                            "rule_component_count": rule_component_count,
-                            "rule_component_color": rule_component_color,
-                        }
-                    )
-                rule_parsed["bag_rule_components"] = bag_rule_components
-            result.append(rule_parsed)
-
-        return result
-
-
-def count_bags_inside_a_bag(graph, color, count=0):
+        return [self.parse_line(rule_raw) for rule_raw in rules_raw]
+
+    def parse_line(self, line: str) -> dict:
+        """
+        Parse a single rule
+
+        :param line: Raw rule
+        :return: Parsed rule
+        """
+        bag_color, content_raw = BAGS_RULE_LINE_REGEX.match(line).groups()
+        rule_parsed = {"bag_color": bag_color, "bag_rule_components": []}
+        if content_raw != "no other bags":
+            bag_rule_components = []
+            bag_rule_components_raw = content_raw.split(",")
+            for bag_rule_component_raw in bag_rule_components_raw:
+                (
+                    rule_component_count,
+                    rule_component_color,
+                ) = BAGS_RULE_COMPONENT_REGEX.match(
+                    bag_rule_component_raw.strip()
+                ).groups()
+
+                bag_rule_components.append(
+                    {
+                        "rule_component_count": rule_component_count,
+                        "rule_component_color": rule_component_color,
+                    }
+                )
+            rule_parsed["bag_rule_components"] = bag_rule_components
+        return rule_parsed
+
+
+class BagGraph:
     """
-    Given a graph and a bag color color, find the number of bags inside
+    Compact bag graph: colors are interned to integer ids and the edges stored in CSR
+    arrays, forward (container to contained bags, with their counts) and reverse
+    (contained to container bags).
 
-    :param graph: Graph
-    :param color: Bag color
-    :param count: Actual count
-    :return: Total count
+    The edges of color id i are targets[offsets[i]:offsets[i + 1]].
+    """
+
+    colors = None
+    color_ids = None
+    forward_offsets = None
+    forward_targets = None
+    forward_weights = None
+    reverse_offsets = None
+    reverse_targets = None
+    # Contained counts per modulus, see get_contained_counts
+    contained_counts = None
+
+    def __init__(
+        self,
+        colors: List[str],
+        sources: np.ndarray,
+        targets: np.ndarray,
+        weights: np.ndarray,
+    ) -> None:
+        """
+        :param colors: Color of each id
+        :param sources: Container color id of each edge
+        :param targets: Contained color id of each edge
+        :param weights: Number of contained bags of each edge
+        """
+        self.colors = colors
+        self.color_ids = {color: color_id for color_id, color in enumerate(colors)}
+
+        self.forward_offsets, order = get_csr_order(sources, len(colors))
+        self.forward_targets = targets[order]
+        self.forward_weights = weights[order]
+
+        self.reverse_offsets, order = get_csr_order(targets, len(colors))
+        self.reverse_targets = sources[order]
+
+        self.contained_counts = {}
+
+    @classmethod
+    def from_rules(cls, rules: List[dict]) -> "BagGraph":
+        """
+        Build the graph of a list of rules, see BagRules
+
+        :param rules: Rules list
+        :return: Bag graph
+        """
+        color_ids = {}
+        sources = []
+        targets = []
+        weights = []
+
+        for rule in rules:
+            source = color_ids.setdefault(rule["bag_color"], len(color_ids))
+            for rule_component in rule["bag_rule_components"]:
+                color = rule_component["rule_component_color"]
+                sources.append(source)
+                targets.append(color_ids.setdefault(color, len(color_ids)))
+                weights.append(int(rule_component["rule_component_count"]))
+
+        return cls(
+            list(color_ids),
+            np.array(sources, dtype=np.int64),
+            np.array(targets, dtype=np.int64),
+            np.array(weights, dtype=np.int64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.colors)
+
+    def get_color_id(self, color: str) -> int:
+        return self.color_ids[color]
+
+    def find_ancestors(self, color: str) -> np.ndarray:
+        """
+        Breadth first search of the bags eventually containing a bag, one frontier at
+        a time
+
+        :param color: Bag color
+        :return: Color ids of the containing bags
+        """
+        color_id = self.get_color_id(color)
+        visited = np.zeros(len(self), dtype=bool)
+        frontier = np.array([color_id], dtype=np.int64)
+        while frontier.size:
+            neighbours = get_csr_neighbours(
+                self.reverse_offsets, self.reverse_targets, frontier
+            )
+            frontier = np.unique(neighbours[~visited[neighbours]])
+            visited[frontier] = True
+        visited[color_id] = False
+        return np.flatnonzero(visited)
+
+    def count_ancestors(self, color: str) -> int:
+        return len(self.find_ancestors(color))
+
+    def get_topological_order(self) -> np.ndarray:
+        """
+        Order the colors so that every bag comes before the bags it contains (Kahn
+        algorithm, one frontier at a time)
+
+        :return: Color ids
+        """
+        containers_left = np.diff(self.reverse_offsets)
+        frontier = np.flatnonzero(containers_left == 0)
+        order = []
+        while frontier.size:
+            order.append(frontier)
+            neighbours = get_csr_neighbours(
+                self.forward_offsets, self.forward_targets, frontier
+            )
+            containers_left -= np.bincount(neighbours, minlength=len(self))
+            neighbours = np.unique(neighbours)
+            frontier = neighbours[containers_left[neighbours] == 0]
+
+        order = np.concatenate(order) if order else np.zeros(0, dtype=np.int64)
+        if len(order) != len(self):
+            raise Exception("Bag rules contain a cycle")
+        return order
+
+    def get_contained_counts(self, modulus: Optional[int] = None) -> List[int]:
+        """
+        Count the bags of every bag, itself included, in a single pass over the colors
+        in reverse topological order. Counts are cached per modulus.
+
+        :param modulus: Compute the counts modulo this number, exact counts if None
+        :return: Count per color id
+        """
+        if modulus in self.contained_counts:
+            return self.contained_counts[modulus]
+
+        offsets = self.forward_offsets.tolist()
+        targets = self.forward_targets.tolist()
+        weights = self.forward_weights.tolist()
+        counts = [0] * len(self)
+
+        for color_id in reversed(self.get_topological_order().tolist()):
+            count = 1
+            for edge in range(offsets[color_id], offsets[color_id + 1]):
+                count += weights[edge] * counts[targets[edge]]
+            counts[color_id] = count if modulus is None else count % modulus
+
+        self.contained_counts[modulus] = counts
+        return counts
+
+    def count_bags_inside(self, color: str, modulus: Optional[int] = None) -> int:
+        """
+        Count the bags of a bag, itself included
+
+        :param color: Bag color
+        :param modulus: Count modulo this number, exact count if None
+        :return: Total count
+        """
+        return self.get_contained_counts(modulus)[self.get_color_id(color)]
+
+
+class BagClosureIndex:
     """
-    # Graph is reversed
-    edges = graph.in_edges(color)
-    if not edges:
-        return 1
+    Transitive closure of a bag graph, the "can eventually contain" relation.
+
+    Colors are numbered by topological order, so the bags able to hold a bag all come
+    before it; the ancestors of each color are a bitset row over those positions,
+    stored as a Python integer.
+    """
+
+    graph = None
+    order = None
+    positions = None
+    rows = None
+    ancestor_counts = None
+
+    def __init__(self, graph: BagGraph) -> None:
+        self.graph = graph
+        self.order = graph.get_topological_order()
+        self.positions = np.empty(len(graph), dtype=np.int64)
+        self.positions[self.order] = np.arange(len(graph))
+
+        offsets = graph.reverse_offsets.tolist()
+        containers = self.positions[graph.reverse_targets].tolist()
+        rows = []
+        for color_id in self.order.tolist():
+            row = 0
+            for edge in range(offsets[color_id], offsets[color_id + 1]):
+                position = containers[edge]
+                row |= rows[position] | (1 << position)
+            rows.append(row)
+
+        self.rows = rows
+        self.ancestor_counts = [bin(row).count("1") for row in rows]
+
+    @classmethod
+    def from_rules(cls, rules: List[dict]) -> "BagClosureIndex":
+        return cls(BagGraph.from_rules(rules))
+
+    def get_row(self, color: str) -> int:
+        return self.rows[self.positions[self.graph.get_color_id(color)]]
+
+    def count_ancestors(self, color: str) -> int:
+        return self.ancestor_counts[self.positions[self.graph.get_color_id(color)]]
+
+    def can_contain(self, outer_color: str, inner_color: str) -> bool:
+        position = self.positions[self.graph.get_color_id(outer_color)]
+        return bool((self.get_row(inner_color) >> int(position)) & 1)
 
-    temp_result = 0
-    for edge in edges:
-        weight = graph[edge[0]][edge[1]]["weight"]
-        result = int(weight) * count_bags_inside_a_bag(graph, edge[0], count)
-        temp_result += result
+    def find_ancestors(self, color: str) -> np.ndarray:
+        """
+        Find the bags eventually containing a bag
+
+        :param color: Bag color
+        :return: Color ids of the containing bags
+        """
+        return self.order[get_set_bits(self.get_row(color))]
 
-    return count + temp_result + 1
+    def export(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Export the whole closure as pairs of color ids
+
+        :return: Contained color ids, containing color ids
+        """
+        contained = []
+        containers = []
+        for color_id, row in zip(self.order.tolist(), self.rows):
+            positions = get_set_bits(row)
+            contained.append(np.full(len(positions), color_id, dtype=np.int64))
+            containers.append(self.order[positions])
 
+        if not contained:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(contained), np.concatenate(containers)
 
-def create_bag_graph(rules):
+
+class IncrementalBagGraph:
     """
-    Given a list of rules, create an inverted directed graph representing the russion
-    dolls bags.
+    Mutable bag graph, for rule sets edited one rule at a time.
 
-    :param rules: Rules list
-    :return:graph
+    Contained counts and ancestor sets are computed lazily and memoized. An edit only
+    drops the memoized values it changes: the contained counts of the edited bag and
+    of the bags holding it, and the ancestors of the bags it used to or now contains,
+    and of their content. As a memoized count implies memoized counts for the whole
+    content of a bag, and memoized ancestors imply memoized ancestors for all its
+    containers, the invalidation stops at the first bag without a memoized value.
     """
-    graph = nx.DiGraph()
 
-    for rule in rules:
+    colors = None
+    color_ids = None
+    # Per color id, contained color id to count, and containing color ids
+    contents = None
+    containers = None
+    ruled_color_ids = None
+    contained_counts = None
+    # Per color id, bitset of the ancestors color ids
+    ancestors = None
+
+    def __init__(self) -> None:
+        self.colors = []
+        self.color_ids = {}
+        self.contents = []
+        self.containers = []
+        self.ruled_color_ids = set()
+        self.contained_counts = {}
+        self.ancestors = {}
+
+    @classmethod
+    def from_rules(cls, rules: List[dict]) -> "IncrementalBagGraph":
+        """
+        Bulk load a list of rules, see BagRules
+
+        :param rules: Rules list
+        :return: Bag graph
+        """
+        graph = cls()
+        for rule in rules:
+            color_id, content = graph.get_rule_content(rule)
+            graph.ruled_color_ids.add(color_id)
+            graph.contents[color_id] = content
+            for contained_id in content:
+                graph.containers[contained_id].add(color_id)
+
+        # Raises on cyclic rules
+        graph.to_graph().get_topological_order()
+        return graph
+
+    def __len__(self) -> int:
+        return len(self.colors)
+
+    def get_color_id(self, color: str) -> int:
+        """
+        Get the id of a color, registering it if it is new
+
+        :param color: Bag color
+        :return: Color id
+        """
+        color_id = self.color_ids.get(color)
+        if color_id is None:
+            color_id = len(self.colors)
+            self.color_ids[color] = color_id
+            self.colors.append(color)
+            self.contents.append({})
+            self.containers.append(set())
+        return color_id
+
+    def get_rule_content(self, rule: dict) -> Tuple[int, Dict[int, int]]:
+        content = {}
         for rule_component in rule["bag_rule_components"]:
-            graph.add_edge(
-                rule_component["rule_component_color"],
-                rule["bag_color"],
-                weight=rule_component["rule_component_count"],
+            contained_id = self.get_color_id(rule_component["rule_component_color"])
+            content[contained_id] = int(rule_component["rule_component_count"])
+        return self.get_color_id(rule["bag_color"]), content
+
+    def to_graph(self) -> BagGraph:
+        """
+        Snapshot of the current rules as a compact graph
+        """
+        sources = []
+        targets = []
+        weights = []
+        for color_id, content in enumerate(self.contents):
+            for contained_id, count in content.items():
+                sources.append(color_id)
+                targets.append(contained_id)
+                weights.append(count)
+
+        return BagGraph(
+            list(self.colors),
+            np.array(sources, dtype=np.int64),
+            np.array(targets, dtype=np.int64),
+            np.array(weights, dtype=np.int64),
+        )
+
+    def add_rule(self, rule: dict) -> None:
+        """
+        Add the rule of a bag color without one
+
+        :param rule: Parsed rule, see BagRules.parse_line
+        """
+        if self.color_ids.get(rule["bag_color"]) in self.ruled_color_ids:
+            raise Exception(f"A rule already exists for {rule['bag_color']} bags")
+        self.set_rule(rule)
+
+    def modify_rule(self, rule: dict) -> None:
+        """
+        Replace the rule of a bag color
+
+        :param rule: Parsed rule, see BagRules.parse_line
+        """
+        if self.color_ids.get(rule["bag_color"]) not in self.ruled_color_ids:
+            raise Exception(f"No rule exists for {rule['bag_color']} bags")
+        self.set_rule(rule)
+
+    def remove_rule(self, color: str) -> None:
+        """
+        Remove the rule of a bag color, leaving it empty
+
+        :param color: Bag color
+        """
+        if self.color_ids.get(color) not in self.ruled_color_ids:
+            raise Exception(f"No rule exists for {color} bags")
+        self.set_rule({"bag_color": color, "bag_rule_components": []})
+        self.ruled_color_ids.discard(self.color_ids[color])
+
+    def set_rule(self, rule: dict) -> None:
+        """
+        Add or replace a rule, invalidating the memoized values it changes
+
+        :param rule: Parsed rule, see BagRules.parse_line
+        """
+        color_id, content = self.get_rule_content(rule)
+        old_content = self.contents[color_id]
+        added_ids = content.keys() - old_content.keys()
+        removed_ids = old_content.keys() - content.keys()
+
+        if self.is_reachable(added_ids, color_id):
+            raise Exception(f"Rule for {rule['bag_color']} bags creates a cycle")
+
+        self.ruled_color_ids.add(color_id)
+        if content == old_content:
+            return
+
+        self.invalidate_contained_counts(color_id)
+        self.invalidate_ancestors(added_ids | removed_ids)
+
+        for contained_id in removed_ids:
+            self.containers[contained_id].discard(color_id)
+        for contained_id in added_ids:
+            self.containers[contained_id].add(color_id)
+        self.contents[color_id] = content
+
+    def is_reachable(self, color_ids: Iterable[int], target_id: int) -> bool:
+        """
+        Check whether a bag is inside some of the given bags, or one of them
+
+        :param color_ids: Color ids
+        :param target_id: Searched color id
+        :return: Result
+        """
+        stack = list(color_ids)
+        seen = set(stack)
+        while stack:
+            color_id = stack.pop()
+            if color_id == target_id:
+                return True
+            for contained_id in self.contents[color_id]:
+                if contained_id not in seen:
+                    seen.add(contained_id)
+                    stack.append(contained_id)
+        return False
+
+    def invalidate_contained_counts(self, color_id: int) -> None:
+        stack = [color_id]
+        while stack:
+            color_id = stack.pop()
+            if self.contained_counts.pop(color_id, None) is not None:
+                stack.extend(self.containers[color_id])
+
+    def invalidate_ancestors(self, color_ids: Iterable[int]) -> None:
+        stack = list(color_ids)
+        while stack:
+            color_id = stack.pop()
+            if self.ancestors.pop(color_id, None) is not None:
+                stack.extend(self.contents[color_id])
+
+    def count_bags_inside(self, color: str) -> int:
+        """
+        Count the bags of a bag, itself included, memoizing the count of its content
+
+        :param color: Bag color
+        :return: Total count
+        """
+        counts = self.contained_counts
+        stack = [self.color_ids[color]]
+        while stack:
+            color_id = stack[-1]
+            if color_id in counts:
+                stack.pop()
+                continue
+
+            content = self.contents[color_id]
+            missing = [
+                contained_id for contained_id in content if contained_id not in counts
+            ]
+            if missing:
+                stack.extend(missing)
+                continue
+
+            stack.pop()
+            counts[color_id] = 1 + sum(
+                count * counts[contained_id] for contained_id, count in content.items()
             )
 
-    return graph
+        return counts[self.color_ids[color]]
+
+    def get_ancestors(self, color_id: int) -> int:
+        """
+        Bitset of the color ids of the bags eventually containing a bag, memoizing the
+        ancestors of its containers
+
+        :param color_id: Color id
+        :return: Ancestors bitset
+        """
+        ancestors = self.ancestors
+        stack = [color_id]
+        while stack:
+            current_id = stack[-1]
+            if current_id in ancestors:
+                stack.pop()
+                continue
 
+            containers = self.containers[current_id]
+            missing = [
+                container_id
+                for container_id in containers
+                if container_id not in ancestors
+            ]
+            if missing:
+                stack.extend(missing)
+                continue
 
-test_reader = BagRules("input-test.txt")
-test_data = test_reader.read()
+            stack.pop()
+            row = 0
+            for container_id in containers:
+                row |= ancestors[container_id] | (1 << container_id)
+            ancestors[current_id] = row
 
-reader = BagRules("input.txt")
-prod_data = reader.read()
+        return ancestors[color_id]
 
-data_sources = (
-    ("Test data", test_data),
-    ("Prod data", prod_data),
-)
+    def find_ancestors(self, color: str) -> List[str]:
+        """
+        Find the bags eventually containing a bag
 
-for data_source_name, data_source in data_sources:
-    graph = create_bag_graph(data_source)
+        :param color: Bag color
+        :return: Colors of the containing bags
+        """
+        row = self.get_ancestors(self.color_ids[color])
+        return [self.colors[color_id] for color_id in get_set_bits(row).tolist()]
 
-    LOG.info(
-        f"Day 07 result 1 - {data_source_name}: {len(nx.descendants(graph, 'shiny gold'))} "
-    )
+    def count_ancestors(self, color: str) -> int:
+        return bin(self.get_ancestors(self.color_ids[color])).count("1")
 
-    LOG.info(
-        f"Day 07 result 2 - {data_source_name}: {count_bags_inside_a_bag(graph, 'shiny gold')} "
+
+def get_set_bits(bitset: int) -> np.ndarray:
+    """
+    Expand a bitset into the sorted positions of its set bits
+
+    :param bitset: Bitset
+    :return: Positions
+    """
+    packed = bitset.to_bytes((bitset.bit_length() + 7) // 8, "little")
+    bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8), bitorder="little")
+    return np.flatnonzero(bits)
+
+
+def get_csr_order(
+    sources: np.ndarray, node_number: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sort edges by source node
+
+    :param sources: Source node of each edge
+    :param node_number: Number of nodes
+    :return: CSR offsets, edges order
+    """
+    offsets = np.zeros(node_number + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=node_number), out=offsets[1:])
+    return offsets, np.argsort(sources, kind="stable")
+
+
+def get_csr_neighbours(
+    offsets: np.ndarray, targets: np.ndarray, nodes: np.ndarray
+) -> np.ndarray:
+    """
+    Concatenate the neighbours of several nodes of a CSR graph
+
+    :param offsets: CSR offsets
+    :param targets: CSR targets
+    :param nodes: Nodes
+    :return: Neighbours, with repetitions
+    """
+    starts = offsets[nodes]
+    lengths = offsets[nodes + 1] - starts
+    # Index of each neighbour: its node start plus its rank among the node edges
+    edge_starts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return targets[edge_starts + np.arange(lengths.sum())]
+
+
+def count_bags_inside_a_bag(
+    graph: BagGraph, color: str, modulus: Optional[int] = None
+) -> int:
+    """
+    Given a graph and a bag color color, find the number of bags inside
+
+    :param graph: Graph
+    :param color: Bag color
+    :param modulus: Count modulo this number, exact count if None
+    :return: Total count
+    """
+    return graph.count_bags_inside(color, modulus)
+
+
+def create_bag_graph(rules: List[dict]) -> BagGraph:
+    """
+    Given a list of rules, create a graph representing the russian dolls bags.
+
+    :param rules: Rules list
+    :return: graph
+    """
+    return BagGraph.from_rules(rules)
+
+
+def main(input_directory: str = INPUT_DIRECTORY) -> None:
+    """
+    Solve both parts of the day for each data source.
+
+    :param input_directory: Directory holding the input files
+    """
+    with phase("read"):
+        test_reader = BagRules(join(input_directory, "input-test.txt"))
+        test_data = test_reader.cached_read()
+
+        reader = BagRules(join(input_directory, "input.txt"))
+        prod_data = reader.cached_read()
+
+    data_sources = (
+        ("Test data", test_data),
+        ("Prod data", prod_data),
     )
+
+    for data_source_name, data_source in data_sources:
+        with phase(f"{data_source_name} graph"):
+            graph = create_bag_graph(data_source)
+
+        with phase(f"{data_source_name} part 1"):
+            ancestors_count = graph.count_ancestors("shiny gold")
+        LOG.info(f"Day 07 result 1 - {data_source_name}: {ancestors_count} ")
+
+        with phase(f"{data_source_name} part 2"):
+            bags_count = count_bags_inside_a_bag(graph, "shiny gold")
+        LOG.info(f"Day 07 result 2 - {data_source_name}: {bags_count} ")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,24 @@
 import re
-from copy import copy, deepcopy
-from typing import List, Optional, Union
+from array import array
+from collections import deque
+from os.path import abspath, dirname, join
+from typing import Dict, List, Optional, Tuple, Union
 
-from utils.log import LOG
+from utils.log import LOG, phase
 from utils.readers import FileReader
 
+INPUT_DIRECTORY = dirname(abspath(__file__))
+
 
 END_OF_TAPE = object
 
+# Integer instruction codes of a compiled program
+NOP = 0
+ACC = 1
+JMP = 2
+OPCODES = {"nop": NOP, "acc": ACC, "jmp": JMP}
+TRACE_BUFFER_SIZE = 64
+
 
 class InfiniteLoopException(Exception):
     pass
@@ -22,29 +33,49 @@ class ProgramReader(FileReader):
     jmp +4
     """
 
-    def read(self, *args, **kwargs) -> List[List[str]]:
+    def read(
+        self, *args, compiled: bool = False, **kwargs
+    ) -> Union[List[List[str]], "CompiledProgram"]:
         """
         Implementation of a program file read function.
-        """
-        data = super(ProgramReader, self).read()
 
-        lines = [line.split(" ") for line in data.split("\n") if line]
-        result = []
-        for instruction, value in lines:
-            operation = "add"
-            if value.startswith("-"):
-                operation = "sub"
-            result.append([instruction, operation, int(value[1:])])
+        :param compiled: Return the program as opcode and offset arrays
+        """
+        if compiled:
+            return self.read_compiled()
+        return self.parse_lines()
 
-        return result
+    def read_compiled(self) -> "CompiledProgram":
+        """
+        Parse the file straight into a compiled program
+        """
+        opcodes = bytearray()
+        offsets = array("q")
+        for line in self.read_lines():
+            instruction, value = line.split(" ")
+            opcodes.append(OPCODES[instruction])
+            offsets.append(int(value))
+        return CompiledProgram(opcodes, offsets)
+
+    def parse_line(self, line: str, *args, **kwargs) -> List:
+        """
+        Split a program line into instruction, operation and absolute value.
+        """
+        instruction, value = line.split(" ")
+        operation = "add"
+        if value.startswith("-"):
+            operation = "sub"
+        return [instruction, operation, int(value[1:])]
 
 
 class Tape(object):
     visited_index = None
+    visited = None
     accumulator = None
 
     def __init__(self, tape: List) -> None:
         self.visited_index = []
+        self.visited = set()
         self.__tape = tape
         self.accumulator = 0
 
@@ -54,16 +85,16 @@ class Tape(object):
         else:
             return None
 
-    def check_tape_validity(self) -> None:
+    def check_tape_validity(self, index: int) -> None:
         """
-        Check that at any moment during a tape execution, no instruction was ever
-        visited twice.
+        Check that the instruction about to be executed was never visited, so that no
+        instruction is ever visited twice during a tape execution.
 
-        :return: Tape is valid
+        :param index: Index of instruction to execute
         """
-        visited_set = set(self.visited_index)
-        if len(visited_set) != len(self.visited_index):
+        if index in self.visited:
             raise InfiniteLoopException()
+        self.visited.add(index)
 
     def execute_instruction(self, index: int) -> Union[int, END_OF_TAPE]:
         """
@@ -83,7 +114,7 @@ class Tape(object):
         instruction, operation, value = instruction_list
 
         self.visited_index.append(index)
-        self.check_tape_validity()
+        self.check_tape_validity(index)
 
         if instruction == "nop" or instruction == "acc":
             if instruction == "acc":
@@ -139,30 +170,320 @@ def change_tape(tape_input, index_to_change):
     return True, tape.accumulator
 
 
-test_reader = ProgramReader("input-test.txt")
-test_data = test_reader.read()
+class CompiledProgram:
+    """
+    Program as two parallel arrays, the instruction codes (NOP, ACC, JMP) and their
+    signed values.
+    """
+
+    opcodes = None
+    offsets = None
 
-reader = ProgramReader("input.txt")
-prod_data = reader.read()
+    def __init__(self, opcodes: bytearray, offsets: array) -> None:
+        self.opcodes = opcodes
+        self.offsets = offsets
 
-data_sources = (
-    ("Test data", test_data),
-    ("Prod data", prod_data),
-)
+    @classmethod
+    def from_tape_input(cls, tape_input: List[List]) -> "CompiledProgram":
+        """
+        Compile a program parsed by ProgramReader.read
 
-for data_source_name, data_source in data_sources:
-    tape = Tape(data_source)
-    try:
-        tape.execute_program()
-    except InfiniteLoopException:
-        pass
+        :param tape_input: Instruction, operation and absolute value per line
+        :return: Compiled program
+        """
+        opcodes = bytearray(OPCODES[instruction] for instruction, _, _ in tape_input)
+        offsets = array(
+            "q",
+            (
+                value if operation == "add" else -value
+                for _, operation, value in tape_input
+            ),
+        )
+        return cls(opcodes, offsets)
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    def change_instruction(self, index: int) -> "CompiledProgram":
+        """
+        Copy of the program with the instruction at index permuted, jmp for a nop and
+        nop otherwise, see change_tape
+
+        :param index: Index of the instruction to permute
+        :return: Changed program
+        """
+        opcodes = bytearray(self.opcodes)
+        opcodes[index] = JMP if opcodes[index] == NOP else NOP
+        return CompiledProgram(opcodes, self.offsets)
+
+
+class ExecutionTrace:
+    """
+    Record of traced runs, see Interpreter: hit count per instruction over all the
+    runs, the last executed (index, accumulator after execution) pairs and, when the
+    last run loops, its loop entry index and cycle length.
+
+    A run stops before executing an instruction a second time, so on its own it hits
+    each instruction at most once. To see the loop instructions stand out, give
+    loop_steps: looping runs keep being traced for that many extra steps, the run
+    result still being the one at the loop detection.
+    """
+
+    hit_counts = None
+    recent_steps = None
+    loop_steps = None
+    loop_entry = None
+    cycle_length = None
+
+    def __init__(
+        self, buffer_size: int = TRACE_BUFFER_SIZE, loop_steps: int = 0
+    ) -> None:
+        self.hit_counts = array("q")
+        self.recent_steps = deque(maxlen=buffer_size)
+        self.loop_steps = loop_steps
+
+    def reset(self, size: int) -> None:
+        self.hit_counts = array("q", bytes(8 * size))
+        self.recent_steps.clear()
+        self.loop_entry = None
+        self.cycle_length = None
+
+    def get_histogram(self) -> Dict[int, int]:
+        """
+        Hit count of every executed instruction
+
+        :return: Instruction index to hit count
+        """
+        return {index: hits for index, hits in enumerate(self.hit_counts) if hits}
+
+    def get_hot_instructions(self, count: int = 10) -> List[Tuple[int, int]]:
+        """
+        Most executed instructions
+
+        :param count: Number of instructions
+        :return: Instruction index and hit count, by decreasing hit count
+        """
+        return sorted(self.get_histogram().items(), key=lambda item: -item[1])[:count]
+
+    def export(self) -> dict:
+        """
+        Machine readable trace
+        """
+        return {
+            "loop_entry": self.loop_entry,
+            "cycle_length": self.cycle_length,
+            "recent_steps": list(self.recent_steps),
+            "histogram": self.get_histogram(),
+        }
+
+
+class Interpreter:
+    """
+    Compiled program interpreter, running in linear time: every index is marked in a
+    preallocated visited array, and instructions are dispatched on their code.
+
+    Given a trace, runs are recorded into it. The traced loop is picked once here, so
+    untraced runs do not check for tracing at every step.
+    """
+
+    program = None
+    trace = None
+
+    def __init__(
+        self, program: CompiledProgram, trace: Optional[ExecutionTrace] = None
+    ) -> None:
+        self.program = program
+        self.trace = trace
+        if trace is not None:
+            trace.reset(len(program))
+            self.run = self.run_traced
+
+    def run(self, accumulator: int = 0, index: int = 0) -> Tuple[bool, int, int]:
+        """
+        Execute the program until it leaves the tape or an instruction is about to
+        run a second time
+
+        :param accumulator: Initial accumulator value
+        :param index: Index of the first instruction to execute
+        :return: Program terminated, final accumulator, index of the next instruction
+        """
+        opcodes = self.program.opcodes
+        offsets = self.program.offsets
+        size = len(opcodes)
+        visited = bytearray(size)
+
+        while 0 <= index < size:
+            if visited[index]:
+                return False, accumulator, index
+            visited[index] = 1
+
+            opcode = opcodes[index]
+            if opcode == JMP:
+                index += offsets[index]
+            else:
+                if opcode == ACC:
+                    accumulator += offsets[index]
+                index += 1
+
+        return True, accumulator, index
+
+    def run_traced(self, accumulator: int = 0, index: int = 0) -> Tuple[bool, int, int]:
+        """
+        Traced counterpart of run, the step at which each instruction was first run
+        standing for the visited array.
+        """
+        opcodes = self.program.opcodes
+        offsets = self.program.offsets
+        size = len(opcodes)
+        first_steps = [-1] * size
+
+        trace = self.trace
+        trace.loop_entry = None
+        trace.cycle_length = None
+        hit_counts = trace.hit_counts
+        recent_steps = trace.recent_steps
+
+        step = 0
+        loop_steps_left = None
+        result = None
+        while 0 <= index < size:
+            if loop_steps_left is not None:
+                if not loop_steps_left:
+                    break
+                loop_steps_left -= 1
+            elif first_steps[index] >= 0:
+                trace.loop_entry = index
+                trace.cycle_length = step - first_steps[index]
+                result = False, accumulator, index
+                loop_steps_left = trace.loop_steps
+                continue
+            else:
+                first_steps[index] = step
+            hit_counts[index] += 1
+
+            executed_index = index
+            opcode = opcodes[index]
+            if opcode == JMP:
+                index += offsets[index]
+            else:
+                if opcode == ACC:
+                    accumulator += offsets[index]
+                index += 1
 
-    LOG.info(f"Day 08 result 1 - {data_source_name}: accumulator: {tape.accumulator} ")
+            recent_steps.append((executed_index, accumulator))
+            step += 1
 
-    for index in range(1, len(data_source) - 1):
-        fixed, accumulator = change_tape(deepcopy(data_source), index)
-        if fixed:
+        return result or (True, accumulator, index)
+
+
+def find_terminating_instructions(program: CompiledProgram) -> bytearray:
+    """
+    Find the instructions from which the program terminates, walking the jump graph
+    backwards from the instructions leaving the tape.
+
+    :param program: Compiled program
+    :return: 1 for each terminating instruction, 0 otherwise
+    """
+    opcodes = program.opcodes
+    offsets = program.offsets
+    size = len(opcodes)
+
+    # Instructions leading to each instruction
+    predecessors = [[] for _ in range(size)]
+    stack = []
+    for index in range(size):
+        next_index = index + offsets[index] if opcodes[index] == JMP else index + 1
+        if 0 <= next_index < size:
+            predecessors[next_index].append(index)
+        else:
+            stack.append(index)
+
+    terminating = bytearray(size)
+    for index in stack:
+        terminating[index] = 1
+    while stack:
+        for predecessor in predecessors[stack.pop()]:
+            if not terminating[predecessor]:
+                terminating[predecessor] = 1
+                stack.append(predecessor)
+
+    return terminating
+
+
+def repair_program(program: CompiledProgram) -> Optional[Tuple[int, int]]:
+    """
+    Find the nop or jmp to permute for the program to terminate, in linear time.
+
+    The instruction is the first one of the original execution path whose permuted
+    successor leaves the tape or terminates. Since the original path loops, the rest
+    of the repaired run cannot come back through the permuted instruction.
+
+    :param program: Compiled program
+    :return: Index of the instruction to permute, final accumulator of the repaired
+    program, None if the program terminates or cannot be repaired by one permutation
+    """
+    opcodes = program.opcodes
+    offsets = program.offsets
+    size = len(opcodes)
+    terminating = find_terminating_instructions(program)
+    if not size or terminating[0]:
+        return None
+    visited = bytearray(size)
+
+    accumulator = 0
+    index = 0
+    while 0 <= index < size and not visited[index]:
+        visited[index] = 1
+        opcode = opcodes[index]
+        if opcode == ACC:
+            accumulator += offsets[index]
+            index += 1
+            continue
+
+        next_index = index + 1 if opcode == JMP else index + offsets[index]
+        if not 0 <= next_index < size:
+            return index, accumulator
+        if terminating[next_index]:
+            _, accumulator, _ = Interpreter(program).run(accumulator, next_index)
+            return index, accumulator
+
+        index = index + offsets[index] if opcode == JMP else index + 1
+
+    return None
+
+
+def main(input_directory: str = INPUT_DIRECTORY) -> None:
+    """
+    Solve both parts of the day for each data source.
+
+    :param input_directory: Directory holding the input files
+    """
+    with phase("read"):
+        test_reader = ProgramReader(join(input_directory, "input-test.txt"))
+        test_data = test_reader.cached_read(compiled=True)
+
+        reader = ProgramReader(join(input_directory, "input.txt"))
+        prod_data = reader.cached_read(compiled=True)
+
+    data_sources = (
+        ("Test data", test_data),
+        ("Prod data", prod_data),
+    )
+
+    for data_source_name, data_source in data_sources:
+        with phase(f"{data_source_name} part 1"):
+            _, accumulator, _ = Interpreter(data_source).run()
+
+        LOG.info(f"Day 08 result 1 - {data_source_name}: accumulator: {accumulator} ")
+
+        with phase(f"{data_source_name} part 2"):
+            repair = repair_program(data_source)
+        if repair is not None:
+            index, accumulator = repair
             LOG.info(
                 f"Day 08 result 1 - {data_source_name}: Index {index + 1}, accumulator: {accumulator} "
             )
-            break
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,12 @@
 import re
+from os.path import abspath, dirname, join
 from copy import copy, deepcopy
 from typing import List, Optional, Union, Tuple
 
-from utils.log import LOG
+from utils.log import LOG, phase
 from utils.readers import FileReader, OneColumnFileReader
 
-test_reader = OneColumnFileReader("input-test.txt")
-test_data = test_reader.read(type_to_cast=int)
-
-reader = OneColumnFileReader("input.txt")
-prod_data = reader.read(type_to_cast=int)
-
-data_sources = (
-    ("Test data", test_data),
-    ("Prod data", prod_data),
-)
+INPUT_DIRECTORY = dirname(abspath(__file__))
 
 
 def check_number_validity(preamble: List[int], number: int) -> bool:
@@ -74,16 +66,40 @@ def find_contiguous_set(input: List[int], number_to_find: int) -> List[int]:
     raise Exception("Set not found")
 
 
-for data_source_name, data_source in data_sources:
-    preamble_length = 5
-    if data_source_name == "Prod data":
-        preamble_length = 25
+def main(input_directory: str = INPUT_DIRECTORY) -> None:
+    """
+    Solve both parts of the day for each data source.
 
-    invalid_numbers = check_input(data_source, preamble_length=preamble_length)
-    LOG.info(f"Day 09 result 1 - {data_source_name}: {invalid_numbers[0]} ")
+    :param input_directory: Directory holding the input files
+    """
+    with phase("read"):
+        test_reader = OneColumnFileReader(join(input_directory, "input-test.txt"))
+        test_data = test_reader.cached_read(type_to_cast=int, compact=True)
 
-    contiguous_set = find_contiguous_set(data_source, invalid_numbers[0])
+        reader = OneColumnFileReader(join(input_directory, "input.txt"))
+        prod_data = reader.cached_read(type_to_cast=int, compact=True)
 
-    LOG.info(
-        f"Day 09 result 2 - {data_source_name}: {min(contiguous_set) + max(contiguous_set)} "
+    data_sources = (
+        ("Test data", test_data),
+        ("Prod data", prod_data),
     )
+
+    for data_source_name, data_source in data_sources:
+        preamble_length = 5
+        if data_source_name == "Prod data":
+            preamble_length = 25
+
+        with phase(f"{data_source_name} part 1"):
+            invalid_numbers = check_input(data_source, preamble_length=preamble_length)
+        LOG.info(f"Day 09 result 1 - {data_source_name}: {invalid_numbers[0]} ")
+
+        with phase(f"{data_source_name} part 2"):
+            contiguous_set = find_contiguous_set(data_source, invalid_numbers[0])
+
+        LOG.info(
+            f"Day 09 result 2 - {data_source_name}: {min(contiguous_set) + max(contiguous_set)} "
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,16 @@
+from os.path import abspath, dirname, join
 from collections import Counter
 from collections import Counter
 from typing import List, Tuple
 
-from utils.log import LOG
+from utils.log import LOG, phase
 from utils.readers import OneColumnFileReader
 
+INPUT_DIRECTORY = dirname(abspath(__file__))
+
 OUTLET_JOLT_RATING = 0
 RATING_TOLERANCE = 3
 
-test_reader = OneColumnFileReader("input-test.txt")
-test_data = test_reader.read(type_to_cast=int, sort=True)
-
-test_reader = OneColumnFileReader("input-test2.txt")
-test_data2 = test_reader.read(type_to_cast=int, sort=True)
-
-reader = OneColumnFileReader("input.txt")
-prod_data = reader.read(type_to_cast=int, sort=True)
-
-data_sources = (
-    ("Test data", test_data),
-    ("Test data 2 ", test_data2),
-    ("Prod data", prod_data),
-)
-
 
 def find_adapter_by_ratings(adapters_list: List[int], jolt_ratings: List[int]) -> int:
     """
@@ -106,13 +94,41 @@ def find_list_of_adapters_for_device(
     raise Exception(f"Could not find adapters list for rating {device_input_jolt}")
 
 
-for data_source_name, data_source in data_sources:
-    device_jolt_rating = max(data_source) + 3
+def main(input_directory: str = INPUT_DIRECTORY) -> None:
+    """
+    Solve both parts of the day for each data source.
 
-    adapters_list, rating_difference_counter = find_list_of_adapters_for_device(
-        data_source, device_jolt_rating
-    )
+    :param input_directory: Directory holding the input files
+    """
+    with phase("read"):
+        test_reader = OneColumnFileReader(join(input_directory, "input-test.txt"))
+        test_data = test_reader.cached_read(type_to_cast=int, sort=True, compact=True)
 
-    LOG.info(
-        f"Day 10 result 1 - {data_source_name}: {rating_difference_counter[1] * rating_difference_counter[3]} "
+        test_reader = OneColumnFileReader(join(input_directory, "input-test2.txt"))
+        test_data2 = test_reader.cached_read(type_to_cast=int, sort=True, compact=True)
+
+        reader = OneColumnFileReader(join(input_directory, "input.txt"))
+        prod_data = reader.cached_read(type_to_cast=int, sort=True, compact=True)
+
+    data_sources = (
+        ("Test data", test_data),
+        ("Test data 2 ", test_data2),
+        ("Prod data", prod_data),
     )
+
+    for data_source_name, data_source in data_sources:
+        device_jolt_rating = max(data_source) + 3
+
+        with phase(f"{data_source_name} part 1"):
+            (
+                adapters_list,
+                rating_difference_counter,
+            ) = find_list_of_adapters_for_device(data_source, device_jolt_rating)
+
+        LOG.info(
+            f"Day 10 result 1 - {data_source_name}: {rating_difference_counter[1] * rating_difference_counter[3]} "
+        )
+
+
+if __name__ == "__main__":
+    main()
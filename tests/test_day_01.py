@@ -0,0 +1,80 @@
+import random
+from itertools import combinations
+from os.path import join
+
+import pytest
+
+from utils.runner import ROOT_DIRECTORY, load_day
+
+day_01 = load_day(join(ROOT_DIRECTORY, "01"))
+
+
+def brute_force_sums(data, k):
+    """
+    Every sum reachable with k entries taken at different indexes
+    """
+    return {sum(values) for values in combinations(data, k)}
+
+
+def assert_valid_match(data, sum_to_check, k, values):
+    assert len(values) == k
+    assert sum(values) == sum_to_check
+    remaining = list(data)
+    for value in values:
+        remaining.remove(value)
+
+
+DATASETS = [
+    [],
+    [1010],
+    [1010, 1010],
+    [1721, 979, 366, 299, 675, 1456],
+    [5, 5, 5, 1, 1, 10],
+    [-3, 0, 3, 7, 7, 7, -10],
+]
+
+
+@pytest.mark.parametrize("data", DATASETS)
+@pytest.mark.parametrize("k", [1, 2, 3, 4])
+def test_sum_index_matches_naive_search(data, k):
+    index = day_01.SumIndex(data)
+    reachable = brute_force_sums(data, k)
+    targets = sorted(reachable | {-100, 0, 2020, 3030, 10 ** 6})
+
+    results = index.query(targets, k)
+    for target in targets:
+        naive = day_01.find_entry_sum_in_list(data, target, k)
+        assert (naive is None) == (target not in reachable)
+        if target in reachable:
+            assert_valid_match(data, target, k, results[target])
+        else:
+            assert results[target] is None
+
+
+@pytest.mark.parametrize("max_pair_sums", [0, day_01.MAX_PAIR_SUMS])
+def test_sum_index_random_batches(max_pair_sums):
+    rng = random.Random(2020)
+    for _ in range(20):
+        data = [rng.randint(-20, 60) for _ in range(rng.randint(0, 25))]
+        index = day_01.SumIndex(data, max_pair_sums=max_pair_sums)
+        for k in (2, 3):
+            reachable = brute_force_sums(data, k)
+            targets = list(range(-70, 190))
+            for target, values in index.query(targets, k).items():
+                if target in reachable:
+                    assert_valid_match(data, target, k, values)
+                else:
+                    assert values is None
+
+
+def test_sum_index_does_not_reuse_single_entries():
+    index = day_01.SumIndex([1010, 5, 7])
+    assert index.find(2020, 2) is None
+    assert index.find(3030, 3) is None
+    assert index.find(1015, 2) == (5, 1010)
+
+
+def test_sum_index_products():
+    index = day_01.SumIndex([1721, 979, 366, 299, 675, 1456])
+    assert index.query_products([2020], 2) == {2020: 514579}
+    assert index.query_products([2020, 1], 3) == {2020: 241861950, 1: None}
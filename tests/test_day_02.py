@@ -0,0 +1,61 @@
+import multiprocessing
+from os.path import join
+
+import pytest
+
+from utils.runner import ROOT_DIRECTORY, load_day
+
+day_02 = load_day(join(ROOT_DIRECTORY, "02"))
+
+DATABASE = """1-3 a: abcde
+1-3 b: cdefg
+not a database line
+2-9 c: ccccccccc
+3-4 d: ddxd
+"""
+
+
+def naive_counts(lines):
+    old_rule_count = 0
+    new_rule_count = 0
+    for line in lines:
+        match = day_02.PASSWORD_DATABASE_LINE_REGEX.match(line)
+        if match is None:
+            continue
+        old_rule_count += day_02.validate_database_line(*match.groups(), old_rule=True)
+        new_rule_count += day_02.validate_database_line(*match.groups())
+    return old_rule_count, new_rule_count
+
+
+@pytest.mark.parametrize("start_method", ["fork", "spawn", "forkserver"])
+def test_parallel_validation_start_methods(tmp_path, start_method):
+    if start_method not in multiprocessing.get_all_start_methods():
+        pytest.skip(f"{start_method} start method is not available")
+
+    file = tmp_path / "input.txt"
+    file.write_text(DATABASE * 50)
+    reader = day_02.PasswordDatabaseReader(str(file))
+
+    old_rule_count, new_rule_count, error_lines = reader.count_valid_passwords_parallel(
+        workers=2, mp_context=multiprocessing.get_context(start_method)
+    )
+
+    assert (old_rule_count, new_rule_count) == naive_counts(DATABASE.split("\n") * 50)
+    assert error_lines == [3 + 5 * index for index in range(50)]
+
+
+def test_parallel_validation_empty_file(tmp_path):
+    file = tmp_path / "input.txt"
+    file.write_text("")
+    reader = day_02.PasswordDatabaseReader(str(file))
+    assert reader.count_valid_passwords_parallel(workers=2) == (0, 0, [])
+
+
+def test_columns_match_line_validation(tmp_path):
+    file = tmp_path / "input.txt"
+    file.write_text(DATABASE.replace("not a database line\n", ""))
+    columns = day_02.PasswordDatabaseReader(str(file)).read(columns=True)
+    assert (
+        columns.count_valid_passwords(old_rule=True),
+        columns.count_valid_passwords(),
+    ) == naive_counts(DATABASE.splitlines())
@@ -0,0 +1,89 @@
+import random
+from os.path import join
+
+import pytest
+
+from utils.runner import ROOT_DIRECTORY, load_day
+
+day_04 = load_day(join(ROOT_DIRECTORY, "04"))
+
+COMPULSORY_FIELDS = ["byr", "iyr", "eyr", "hgt", "hcl", "ecl", "pid"]
+SCHEMAS = {
+    "presence": {field: day_04.no_validation for field in COMPULSORY_FIELDS},
+    "values": {
+        "byr": day_04.validate_byr,
+        "iyr": day_04.validate_iyr,
+        "eyr": day_04.validate_eyr,
+        "hgt": day_04.validate_hgt,
+        "hcl": day_04.validate_hcl,
+        "ecl": day_04.validate_ecl,
+        "pid": day_04.validate_pid,
+    },
+    # Validators without regex equivalent are always called
+    "callables": {
+        "byr": lambda value: day_04.validate_byr(value),
+        "hgt": lambda value: day_04.validate_hgt(value),
+        "pid": day_04.validate_pid,
+    },
+}
+
+# The first two values of each field are valid
+VALUES = {
+    "byr": ["1920", "2002", "1919", "2003", "+1950", "01950", "19_50", "1_9_5_0"],
+    "iyr": ["2010", "2020", "2009", "2021", "20_15", "0002015"],
+    "eyr": ["2020", "2030", "2019", "2031", "202_5", "+2025"],
+    "hgt": ["150cm", "193cm", "149cm", "194cm", "59in", "76in", "77in", "60", "60inx"],
+    "hcl": ["#123abc", "#123abcd", "#123abz", "123abc", "#12345"],
+    "ecl": ["brn", "oth", "wat", "brnx"],
+    "pid": ["000000001", "١٢٣٤٥٦٧٨٩", "0123456789", "12345678"],
+    "cid": ["147", "", "x"],
+}
+
+
+def generate_batch(rng: random.Random, size: int) -> str:
+    passports = []
+    for _ in range(size):
+        components = []
+        for field, values in VALUES.items():
+            # Missing, once or repeated fields
+            for _ in range(rng.choice([0, 1, 1, 1, 2])):
+                if rng.random() < 0.8:
+                    values = values[:2]
+                components.append(f"{field}:{rng.choice(values)}")
+        rng.shuffle(components)
+        passports.append(
+            "".join(
+                component + rng.choice([" ", "\n", "  "]) for component in components
+            ).strip()
+        )
+    return rng.choice(["", "\n\n"]) + "\n\n".join(passports) + rng.choice(["", "\n"])
+
+
+@pytest.mark.parametrize("schema", SCHEMAS)
+def test_compiled_schema_matches_validators(tmp_path, schema):
+    compulsory = SCHEMAS[schema]
+    count_valid_passports = day_04.compile_passport_schema(compulsory)
+    rng = random.Random(2020)
+    for index in range(50):
+        file = tmp_path / f"input-{index}.txt"
+        file.write_text(generate_batch(rng, rng.randint(0, 30)), encoding="utf-8")
+        reader = day_04.PassportBatchReader(str(file))
+
+        expected = day_04.validate_raw_passports(reader.read(), compulsory)
+        assert count_valid_passports(reader.read(raw=True)) == expected
+
+
+def test_compiled_schema_keeps_last_duplicate_value():
+    compulsory = SCHEMAS["values"]
+    count_valid_passports = day_04.compile_passport_schema(compulsory)
+    valid = "byr:1950 iyr:2015 eyr:2025 hgt:170cm hcl:#123abc ecl:brn pid:000000001"
+    assert count_valid_passports(f"{valid} byr:1900") == 0
+    assert count_valid_passports(f"byr:1900 {valid}") == 1
+
+
+def test_compiled_schema_rejects_malformed_components():
+    count_valid_passports = day_04.compile_passport_schema(SCHEMAS["presence"])
+    with pytest.raises(ValueError):
+        day_04.validate_raw_passports([["byr:19:50"]], SCHEMAS["presence"])
+    with pytest.raises(ValueError):
+        count_valid_passports("byr:19:50")
@@ -0,0 +1,159 @@
+import random
+from os.path import join
+
+import pytest
+
+from utils.runner import ROOT_DIRECTORY, load_day
+
+day_05 = load_day(join(ROOT_DIRECTORY, "05"))
+
+BOARDING_PASSES = ["FBFBBFFRLR", "BFFFBBFRRR", "FFFBBBFRRR", "BBFFBBFRLL"]
+
+
+def test_decode_boarding_passes_matches_dichotomic_decoding():
+    seat_ids = day_05.decode_boarding_passes(BOARDING_PASSES)
+    assert seat_ids.tolist() == [
+        day_05.decode_boarding_pass(boarding_pass)[2]
+        for boarding_pass in BOARDING_PASSES
+    ]
+
+
+@pytest.mark.parametrize(
+    "boarding_passes",
+    [["FBXBBFFRLR"], ["FBFBBFFRLR", "FBFBBFFRLX"], ["FBFBBFFRLR", "FBFBBFFLLB"]],
+)
+def test_decode_boarding_passes_rejects_invalid_letters(boarding_passes):
+    with pytest.raises(Exception):
+        day_05.decode_boarding_passes(boarding_passes)
+
+
+@pytest.mark.parametrize(
+    "seat_ids, missing_seat_id",
+    [
+        ([], None),
+        ([7], None),
+        ([3, 4, 5], None),
+        ([3, 5, 4, 7], 6),
+        ([0, 2], 1),
+        ([3, 5, 7, 8], None),
+        ([3, 5, 5, 7], None),
+    ],
+)
+def test_find_missing_seat_id(seat_ids, missing_seat_id):
+    assert day_05.find_missing_seat_id(seat_ids) == missing_seat_id
+
+
+def naive_next_set(indexes, index):
+    return min((other for other in indexes if other >= index), default=None)
+
+
+def naive_free_runs(size, seat_ids, length):
+    """
+    Linear scan of the seats, counting the free ones since the last taken seat
+    """
+    taken = set(seat_ids)
+    runs = []
+    last_taken = None
+    for seat_id in range(size):
+        if seat_id not in taken:
+            continue
+        if last_taken is not None and seat_id - last_taken - 1 == length:
+            runs.append(last_taken + 1)
+        last_taken = seat_id
+    return runs
+
+
+@pytest.mark.parametrize("size", [0, 1, 63, 64, 65, 200, 64 ** 2 + 1])
+@pytest.mark.parametrize("fill", [False, True])
+def test_summary_bitset_matches_linear_scans(size, fill):
+    rng = random.Random(size)
+    bitset = day_05.SummaryBitset(size, fill=fill)
+    indexes = set(range(size)) if fill else set()
+
+    for _ in range(300):
+        if size:
+            index = rng.randrange(size)
+            if rng.random() < 0.5:
+                bitset.add(index)
+                indexes.add(index)
+            else:
+                bitset.discard(index)
+                indexes.discard(index)
+
+        query = rng.randrange(size + 2)
+        assert bitset.next_set(query) == naive_next_set(indexes, query)
+        assert bitset.last_set() == max(indexes, default=None)
+        if query < size:
+            assert (query in bitset) == (query in indexes)
+
+    assert bitset.get_indexes().tolist() == sorted(indexes)
+
+
+@pytest.mark.parametrize("size", [0, 1, 64, 300])
+def test_summary_bitset_from_indexes(size):
+    rng = random.Random(size)
+    indexes = [rng.randrange(size) for _ in range(size // 2)] if size else []
+    bitset = day_05.SummaryBitset.from_indexes(size, indexes + indexes)
+
+    reference = day_05.SummaryBitset(size)
+    for index in indexes:
+        reference.add(index)
+    assert bitset.levels == reference.levels
+    assert bitset.get_indexes().tolist() == sorted(set(indexes))
+
+
+def test_summary_bitset_from_indexes_out_of_range():
+    with pytest.raises(Exception):
+        day_05.SummaryBitset.from_indexes(10, [10])
+
+
+@pytest.mark.parametrize("length", [1, 2, 3])
+def test_seat_occupancy_free_runs_match_linear_scan(length):
+    geometry = day_05.PlaneGeometry(5, 2)
+    rng = random.Random(length)
+    for _ in range(20):
+        seat_ids = [
+            seat_id for seat_id in range(geometry.seat_number) if rng.random() < 0.6
+        ]
+        occupancy = day_05.SeatOccupancy(geometry, seat_ids)
+        assert occupancy.find_free_runs(length).tolist() == naive_free_runs(
+            geometry.seat_number, seat_ids, length
+        )
+        assert all(
+            occupancy.is_free(seat_id) == (seat_id not in seat_ids)
+            for seat_id in range(geometry.seat_number)
+        )
+
+
+def test_seat_occupancy_empty_plane():
+    occupancy = day_05.SeatOccupancy(day_05.DEFAULT_PLANE_GEOMETRY, [])
+    assert occupancy.find_isolated_free_seats().tolist() == []
+
+
+def test_seat_allocation_index_matches_linear_scans():
+    geometry = day_05.PlaneGeometry(4, 2)
+    index = day_05.SeatAllocationIndex(geometry)
+    rng = random.Random(2020)
+    boarding_passes = [
+        "".join(rng.choice("FB") for _ in range(4))
+        + "".join(rng.choice("LR") for _ in range(2))
+        for _ in range(200)
+    ]
+    taken = set()
+
+    for boarding_pass in boarding_passes:
+        seat_id = index.get_seat_id(boarding_pass)
+        if seat_id in taken:
+            with pytest.raises(Exception):
+                index.assign(boarding_pass)
+            index.release(boarding_pass)
+            taken.remove(seat_id)
+        else:
+            index.assign(boarding_pass)
+            taken.add(seat_id)
+
+        free = set(range(geometry.seat_number)) - taken
+        query = rng.randrange(geometry.seat_number)
+        assert index.next_free_seat(query) == naive_next_set(free, query)
+        assert index.last_occupied_seat() == max(taken, default=None)
+        assert index.is_free(query) == (query in free)
@@ -0,0 +1,153 @@
+import random
+from os.path import join
+
+import pytest
+
+from utils.runner import ROOT_DIRECTORY, load_day
+
+day_07 = load_day(join(ROOT_DIRECTORY, "07"))
+
+
+def make_rule(color, content):
+    return {
+        "bag_color": color,
+        "bag_rule_components": [
+            {"rule_component_color": other, "rule_component_count": str(count)}
+            for other, count in content.items()
+        ],
+    }
+
+
+def generate_contents(rng, color_number):
+    """
+    Random acyclic rules, bags only holding bags of a higher index
+    """
+    colors = [f"color {index}" for index in range(color_number)]
+    contents = {}
+    for index, color in enumerate(colors):
+        following = colors[index + 1 :]
+        others = rng.sample(following, min(rng.randint(0, 3), len(following)))
+        contents[color] = {other: rng.randint(1, 4) for other in others}
+    return colors, contents
+
+
+def naive_ancestors(contents, color):
+    """
+    Every bag eventually containing a bag, by fixed point iteration over the rules
+    """
+    ancestors = set()
+    changed = True
+    while changed:
+        changed = False
+        for container, content in contents.items():
+            if container not in ancestors and (
+                color in content or ancestors & content.keys()
+            ):
+                ancestors.add(container)
+                changed = True
+    return ancestors
+
+
+def naive_count_bags_inside(contents, color):
+    return 1 + sum(
+        count * naive_count_bags_inside(contents, other)
+        for other, count in contents.get(color, {}).items()
+    )
+
+
+def creates_cycle(contents, color, content):
+    """
+    A rule creates a cycle when it holds the bag itself or one of its containers
+    """
+    return color in content or bool(naive_ancestors(contents, color) & content.keys())
+
+
+@pytest.mark.parametrize("color_number", [0, 1, 5, 40])
+def test_closure_index_matches_naive_closure(color_number):
+    colors, contents = generate_contents(random.Random(color_number), color_number)
+    rules = [make_rule(color, content) for color, content in contents.items()]
+    index = day_07.BagClosureIndex.from_rules(rules)
+    graph = index.graph
+
+    pairs = set()
+    for color in colors:
+        ancestors = naive_ancestors(contents, color)
+        assert index.count_ancestors(color) == len(ancestors)
+        assert {graph.colors[color_id] for color_id in index.find_ancestors(color)} == (
+            ancestors
+        )
+        for other in colors:
+            assert index.can_contain(other, color) == (other in ancestors)
+        pairs |= {(color, ancestor) for ancestor in ancestors}
+
+    contained, containers = index.export()
+    assert {
+        (graph.colors[contained_id], graph.colors[container_id])
+        for contained_id, container_id in zip(contained.tolist(), containers.tolist())
+    } == pairs
+    assert len(contained) == len(pairs)
+
+
+def test_closure_index_rejects_cycles():
+    rules = [make_rule("a", {"b": 1}), make_rule("b", {"a": 2})]
+    with pytest.raises(Exception):
+        day_07.BagClosureIndex.from_rules(rules)
+
+
+def test_incremental_graph_matches_full_recomputation():
+    rng = random.Random(2020)
+    colors, contents = generate_contents(rng, 25)
+    graph = day_07.IncrementalBagGraph.from_rules(
+        [make_rule(color, content) for color, content in contents.items()]
+    )
+
+    for _ in range(300):
+        color = rng.choice(colors)
+        operation = rng.choice(["modify", "remove", "add"])
+        if operation == "remove":
+            if color in contents:
+                graph.remove_rule(color)
+                del contents[color]
+            else:
+                with pytest.raises(Exception):
+                    graph.remove_rule(color)
+        else:
+            content = {
+                other: rng.randint(1, 4)
+                for other in rng.sample(colors, rng.randint(0, 3))
+            }
+            rule = make_rule(color, content)
+            apply = graph.add_rule if operation == "add" else graph.modify_rule
+            has_rule = color in contents
+            if has_rule != (operation == "modify"):
+                with pytest.raises(Exception):
+                    apply(rule)
+            elif creates_cycle(contents, color, content):
+                with pytest.raises(Exception):
+                    apply(rule)
+            else:
+                apply(rule)
+                contents[color] = content
+
+        # Query a few colors, memoizing some values before the next edit
+        for queried in rng.sample(colors, 3):
+            assert graph.count_bags_inside(queried) == naive_count_bags_inside(
+                contents, queried
+            )
+            ancestors = naive_ancestors(contents, queried)
+            assert graph.count_ancestors(queried) == len(ancestors)
+            assert set(graph.find_ancestors(queried)) == ancestors
+
+        snapshot = graph.to_graph()
+        for queried in rng.sample(colors, 3):
+            assert snapshot.count_bags_inside(queried) == naive_count_bags_inside(
+                contents, queried
+            )
+
+
+def test_incremental_graph_empty_rules():
+    graph = day_07.IncrementalBagGraph.from_rules([])
+    assert len(graph) == 0
+    graph.add_rule(make_rule("shiny gold", {}))
+    assert graph.count_bags_inside("shiny gold") == 1
+    assert graph.find_ancestors("shiny gold") == []
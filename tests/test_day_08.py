@@ -0,0 +1,43 @@
+import random
+from os.path import join
+
+import pytest
+
+from utils.runner import ROOT_DIRECTORY, load_day
+
+day_08 = load_day(join(ROOT_DIRECTORY, "08"))
+
+
+def generate_tape_input(rng, size):
+    tape_input = []
+    for index in range(size):
+        instruction = rng.choice(["nop", "acc", "jmp"])
+        # Tape reads negative indexes from the end, never jump before the start
+        value = rng.randint(max(-5, -index), 5) or 1
+        tape_input.append([instruction, "add" if value > 0 else "sub", abs(value)])
+    return tape_input
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_tape_matches_interpreter(seed):
+    tape_input = generate_tape_input(random.Random(seed), 50)
+    terminated, accumulator, _ = day_08.Interpreter(
+        day_08.CompiledProgram.from_tape_input(tape_input)
+    ).run()
+
+    tape = day_08.Tape(tape_input)
+    if terminated:
+        tape.execute_program()
+    else:
+        with pytest.raises(day_08.InfiniteLoopException):
+            tape.execute_program()
+    assert tape.accumulator == accumulator
+    assert len(tape.visited) == len(set(tape.visited_index))
+
+
+def test_tape_long_program():
+    # Quadratic loop detection would take minutes on this tape
+    size = 10 ** 5
+    tape = day_08.Tape([["acc", "add", 1]] * size)
+    tape.execute_program()
+    assert tape.accumulator == size
@@ -0,0 +1,498 @@
+"""
+Benchmark the day solvers on generated inputs of growing size.
+
+Parse and solve phases are timed separately, except for days whose reader only
+loads the raw text and leaves the parsing to the solver, which are timed as a
+single total phase. Results can be saved as a JSON baseline and later runs are
+compared against it.
+
+E.g.
+
+python -m utils.benchmark --save-baseline
+python -m utils.benchmark 1 8 --sizes 100 1000 10000 --threshold 0.25
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from os.path import join
+from types import ModuleType
+from typing import Callable, Dict, List, Optional, Any, Tuple
+
+from utils.log import LOG
+from utils.runner import ROOT_DIRECTORY, discover_days, load_day
+
+DEFAULT_SIZES = [10 ** exponent for exponent in range(2, 7)]
+DEFAULT_BASELINE = join(ROOT_DIRECTORY, "benchmark-baseline.json")
+DEFAULT_THRESHOLD = 0.2
+# Slowdowns below this many seconds are timing noise, never regressions
+DEFAULT_MIN_DELTA = 0.001
+DEFAULT_REPEAT = 5
+# Once a size takes longer than this, larger sizes of the same day are skipped
+DEFAULT_TIME_BUDGET = 30.0
+
+
+class BenchmarkCase:
+    """
+    Representation of a day benchmark.
+
+    :param generate: Write an input of the given size to a file
+    :param parse: Parse an input file with the day module reader
+    :param solve: Solve the parsed data with the day module functions
+    :param max_size: Largest size that can run without exhausting memory
+    :param split_phases: Time parse & solve separately, False when the parse step
+        only loads the raw text and the parsing happens in the solver
+    """
+
+    generate = None
+    parse = None
+    solve = None
+    max_size = None
+    split_phases = None
+
+    def __init__(
+        self,
+        generate: Callable[[random.Random, int], str],
+        parse: Callable[[ModuleType, str], Any],
+        solve: Callable[[ModuleType, Any], Any],
+        max_size: Optional[int] = None,
+        split_phases: bool = True,
+    ) -> None:
+        self.generate = generate
+        self.parse = parse
+        self.solve = solve
+        self.max_size = max_size
+        self.split_phases = split_phases
+
+
+# Generators
+def generate_expenses(rng: random.Random, size: int) -> str:
+    return "\n".join(str(rng.randint(1, 10 ** 6)) for _ in range(size))
+
+
+def generate_password_database(rng: random.Random, size: int) -> str:
+    lines = []
+    for _ in range(size):
+        password = "".join(rng.choice("abcde") for _ in range(rng.randint(5, 20)))
+        lower = rng.randint(1, 5)
+        upper = rng.randint(lower, 5)
+        lines.append(f"{lower}-{upper} {rng.choice('abcde')}: {password}")
+    return "\n".join(lines)
+
+
+def generate_geology_map(rng: random.Random, size: int) -> str:
+    return "\n".join(
+        "".join("#" if rng.random() < 0.2 else "." for _ in range(31))
+        for _ in range(size)
+    )
+
+
+def generate_passports(rng: random.Random, size: int) -> str:
+    fields = {
+        "byr": lambda: str(rng.randint(1900, 2010)),
+        "iyr": lambda: str(rng.randint(2005, 2025)),
+        "eyr": lambda: str(rng.randint(2015, 2035)),
+        "hgt": lambda: f"{rng.randint(140, 200)}{rng.choice(['cm', 'in'])}",
+        "hcl": lambda: "#" + "".join(rng.choice("0123456789abcdef") for _ in range(6)),
+        "ecl": lambda: rng.choice(["amb", "blu", "brn", "gry", "grn", "hzl", "xxx"]),
+        "pid": lambda: str(rng.randint(0, 10 ** 10)).zfill(9),
+        "cid": lambda: str(rng.randint(1, 999)),
+    }
+    passports = []
+    for _ in range(size):
+        components = [
+            f"{field}:{generator()}"
+            for field, generator in fields.items()
+            if rng.random() < 0.9
+        ]
+        passports.append(" ".join(components))
+    return "\n\n".join(passports)
+
+
+def generate_boarding_passes(rng: random.Random, size: int) -> str:
+    return "\n".join(
+        "".join(rng.choice("FB") for _ in range(7))
+        + "".join(rng.choice("LR") for _ in range(3))
+        for _ in range(size)
+    )
+
+
+def generate_custom_answers(rng: random.Random, size: int) -> str:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return "\n\n".join(
+        "\n".join(
+            "".join(rng.sample(letters, rng.randint(1, 10)))
+            for _ in range(rng.randint(1, 5))
+        )
+        for _ in range(size)
+    )
+
+
+def generate_bag_rules(rng: random.Random, size: int) -> str:
+    colors = [f"color{index} shade{index}" for index in range(size)]
+    lines = []
+    for index, color in enumerate(colors):
+        # Only point to following colors to keep the rules acyclic
+        contained = rng.sample(
+            range(index + 1, size), min(rng.randint(0, 3), size - index - 1)
+        )
+        if not contained:
+            lines.append(f"{color} bags contain no other bags.")
+            continue
+        components = ", ".join(
+            f"{rng.randint(1, 5)} {colors[other]} bags" for other in contained
+        )
+        lines.append(f"{color} bags contain {components}.")
+    # Make sure the queried color exists
+    lines[0] = lines[0].replace(colors[0], "shiny gold", 1)
+    return "\n".join(lines)
+
+
+def generate_program(rng: random.Random, size: int) -> str:
+    lines = []
+    for index in range(size):
+        instruction = rng.choice(["nop", "acc", "jmp"])
+        # Forward jumps only, the program always terminates
+        value = rng.randint(1, 3) if instruction == "jmp" else rng.randint(-50, 50)
+        lines.append(f"{instruction} {value:+d}")
+    return "\n".join(lines)
+
+
+def generate_xmas_numbers(rng: random.Random, size: int) -> str:
+    return "\n".join(str(rng.randint(1, 10 ** 12)) for _ in range(size))
+
+
+def generate_adapters(rng: random.Random, size: int) -> str:
+    adapters = []
+    current = 0
+    for _ in range(size):
+        current += rng.randint(1, 3)
+        adapters.append(current)
+    rng.shuffle(adapters)
+    return "\n".join(map(str, adapters))
+
+
+# Solvers
+def solve_day_01(module: ModuleType, data: Any) -> Any:
+    return (
+        module.find_entry_sum_in_list(data, 2020, 2),
+        module.find_entry_sum_in_list(data, 2020, 3),
+    )
+
+
+def solve_day_02(module: ModuleType, data: Any) -> Any:
+    return (
+        data.count_valid_passwords(old_rule=True),
+        data.count_valid_passwords(),
+    )
+
+
+def solve_day_03(module: ModuleType, data: Any) -> Any:
+    slope_vectors = [[1, 1], [1, 3], [1, 5], [1, 7], [2, 1]]
+    return data.count_trees(slope_vectors)
+
+
+def solve_day_04(module: ModuleType, data: Any) -> Any:
+    compulsory = {
+        "byr": module.validate_byr,
+        "iyr": module.validate_iyr,
+        "eyr": module.validate_eyr,
+        "hgt": module.validate_hgt,
+        "hcl": module.validate_hcl,
+        "ecl": module.validate_ecl,
+        "pid": module.validate_pid,
+    }
+    return module.compile_passport_schema(compulsory)(data)
+
+
+def solve_day_05(module: ModuleType, data: Any) -> Any:
+    return int(module.decode_boarding_passes(data).max())
+
+
+def solve_day_06(module: ModuleType, data: Any) -> Any:
+    return module.count_answers_batch(data)
+
+
+def solve_day_07(module: ModuleType, data: Any) -> Any:
+    graph = module.create_bag_graph(data)
+    return module.count_bags_inside_a_bag(graph, "shiny gold")
+
+
+def solve_day_08(module: ModuleType, data: Any) -> Any:
+    return module.Interpreter(data).run()[1]
+
+
+def solve_day_09(module: ModuleType, data: Any) -> Any:
+    invalid_numbers = module.check_input(data, preamble_length=25)
+    # Random numbers rarely sum up to an invalid one, search a sum known to exist
+    middle = len(data) // 2
+    contiguous_set = module.find_contiguous_set(data, sum(data[middle : middle + 3]))
+    return len(invalid_numbers), min(contiguous_set) + max(contiguous_set)
+
+
+def solve_day_10(module: ModuleType, data: Any) -> Any:
+    return module.find_list_of_adapters_for_device(data, max(data) + 3)[1]
+
+
+def parse_with(reader_name: str, **read_kwargs) -> Callable[[ModuleType, str], Any]:
+    """
+    Build a parse function calling the given day module reader
+
+    :param reader_name: Reader class name in the day module
+    :param read_kwargs: Read function parameters
+    :return: Parse function
+    """
+
+    def parse(module: ModuleType, file: str) -> Any:
+        return getattr(module, reader_name)(file).read(**read_kwargs)
+
+    return parse
+
+
+BENCHMARK_CASES = {
+    1: BenchmarkCase(
+        generate_expenses,
+        parse_with("OneColumnFileReader", type_to_cast=int, compact=True),
+        solve_day_01,
+    ),
+    2: BenchmarkCase(
+        generate_password_database,
+        parse_with("PasswordDatabaseReader", columns=True),
+        solve_day_02,
+    ),
+    3: BenchmarkCase(
+        generate_geology_map, parse_with("GeologyMapReader", bitmap=True), solve_day_03
+    ),
+    4: BenchmarkCase(
+        generate_passports,
+        parse_with("PassportBatchReader", raw=True),
+        solve_day_04,
+        split_phases=False,
+    ),
+    5: BenchmarkCase(
+        generate_boarding_passes, parse_with("OneColumnFileReader"), solve_day_05
+    ),
+    6: BenchmarkCase(
+        generate_custom_answers,
+        parse_with("CustomAnswerReader", raw=True),
+        solve_day_06,
+        split_phases=False,
+    ),
+    7: BenchmarkCase(generate_bag_rules, parse_with("BagRules"), solve_day_07),
+    8: BenchmarkCase(
+        generate_program, parse_with("ProgramReader", compiled=True), solve_day_08
+    ),
+    9: BenchmarkCase(
+        generate_xmas_numbers,
+        parse_with("OneColumnFileReader", type_to_cast=int, compact=True),
+        solve_day_09,
+    ),
+    10: BenchmarkCase(
+        generate_adapters,
+        parse_with("OneColumnFileReader", type_to_cast=int, sort=True, compact=True),
+        solve_day_10,
+    ),
+}
+
+
+def time_call(
+    function: Callable, *args, repeat: int = 1
+) -> Tuple[float, float, Any]:
+    """
+    Time a function call, keeping the best of `repeat` runs
+
+    :param function: Function to time
+    :param repeat: Number of runs
+    :return: Best duration in seconds, spread between the median and best runs
+        used as noise estimate, function result
+    """
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    best = durations[0]
+    return best, durations[len(durations) // 2] - best, result
+
+
+def run_pipeline(case: BenchmarkCase, module: ModuleType, file: str) -> Any:
+    return case.solve(module, case.parse(module, file))
+
+
+def benchmark_day(
+    day: int,
+    module: ModuleType,
+    sizes: List[int],
+    repeat: int = DEFAULT_REPEAT,
+    time_budget: float = DEFAULT_TIME_BUDGET,
+    seed: int = 2020,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Benchmark the parse & solve phases of a day for each input size
+
+    :param day: Day number
+    :param module: Day module
+    :param sizes: Input sizes
+    :param repeat: Number of runs per measure, the best one is kept
+    :param time_budget: Skip larger sizes once a measure exceeds it
+    :param seed: Input generation seed
+    :return: Size to phase durations, and to the phase noise estimates under the
+        "noise" key
+    """
+    case = BENCHMARK_CASES[day]
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sorted(sizes):
+            if case.max_size is not None and size > case.max_size:
+                LOG.info(f"Day {day:02d} n={size}: skipped, above max size")
+                continue
+
+            file = join(directory, f"input-{size}.txt")
+            with open(file, "w") as f:
+                f.write(case.generate(random.Random(seed), size))
+
+            if case.split_phases:
+                parse_time, parse_noise, data = time_call(
+                    case.parse, module, file, repeat=repeat
+                )
+                solve_time, solve_noise, _ = time_call(
+                    case.solve, module, data, repeat=repeat
+                )
+                total_time = parse_time + solve_time
+                results[str(size)] = {
+                    "parse": parse_time,
+                    "solve": solve_time,
+                    "noise": {"parse": parse_noise, "solve": solve_noise},
+                }
+                LOG.info(
+                    f"Day {day:02d} n={size}: "
+                    f"parse {parse_time:.4f}s solve {solve_time:.4f}s"
+                )
+            else:
+                total_time, total_noise, _ = time_call(
+                    run_pipeline, case, module, file, repeat=repeat
+                )
+                results[str(size)] = {
+                    "total": total_time,
+                    "noise": {"total": total_noise},
+                }
+                LOG.info(f"Day {day:02d} n={size}: total {total_time:.4f}s")
+
+            if total_time > time_budget:
+                LOG.info(f"Day {day:02d}: time budget exceeded, larger sizes skipped")
+                break
+
+    return results
+
+
+def find_regressions(
+    results: Dict[str, Dict],
+    baseline: Dict[str, Dict],
+    threshold: float,
+    min_delta: float = DEFAULT_MIN_DELTA,
+) -> List[str]:
+    """
+    Compare results to a baseline
+
+    A slowdown is a regression when it exceeds both the relative threshold and a
+    noise floor: the absolute minimum delta, raised to the run to run spread
+    measured on both sides when it is larger.
+
+    :param results: Day to size to phase durations
+    :param baseline: Baseline in the same format
+    :param threshold: Accepted relative slowdown, 0.2 for 20%
+    :param min_delta: Accepted absolute slowdown in seconds
+    :return: Regression descriptions
+    """
+    regressions = []
+    for day, day_results in results.items():
+        for size, phases in day_results.items():
+            for phase, duration in phases.items():
+                if phase == "noise":
+                    continue
+                try:
+                    reference = baseline[day][size][phase]
+                except KeyError:
+                    continue
+                noise_floor = max(
+                    min_delta,
+                    phases.get("noise", {}).get(phase, 0.0)
+                    + baseline[day][size].get("noise", {}).get(phase, 0.0),
+                )
+                if (
+                    duration > reference * (1 + threshold)
+                    and duration - reference > noise_floor
+                ):
+                    regressions.append(
+                        f"Day {day} n={size} {phase}: {duration:.4f}s "
+                        f"vs {reference:.4f}s baseline "
+                        f"(+{duration / reference - 1:.0%})"
+                    )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the AOC 2020 day solvers")
+    parser.add_argument("days", nargs="*", type=int, help="Days to run, default all")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--time-budget", type=float, default=DEFAULT_TIME_BUDGET)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative slowdown flagged as regression",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=DEFAULT_MIN_DELTA,
+        help="Absolute slowdown in seconds below which no regression is flagged",
+    )
+    args = parser.parse_args(argv)
+
+    available_days = discover_days()
+    days = args.days or [day for day in available_days if day in BENCHMARK_CASES]
+
+    results = {}
+    for day in days:
+        try:
+            module = load_day(available_days[day])
+        except ImportError as e:
+            LOG.error(f"Day {day:02d}: cannot be imported, {e}")
+            continue
+        results[str(day)] = benchmark_day(
+            day, module, args.sizes, repeat=args.repeat, time_budget=args.time_budget
+        )
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        LOG.info(f"Baseline saved to {args.baseline}")
+        return
+
+    try:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        LOG.info(f"No baseline found at {args.baseline}")
+        return
+
+    regressions = find_regressions(
+        results, baseline, args.threshold, min_delta=args.min_delta
+    )
+    for regression in regressions:
+        LOG.error(f"Regression: {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
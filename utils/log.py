@@ -1,4 +1,12 @@
+import atexit
+import cProfile
+import json
 import logging
+import os
+import re
+import time
+from contextlib import ContextDecorator
+from typing import Optional
 
 logging.basicConfig(level=logging.INFO, format="")
 LOG = logging.getLogger(__name__)
@@ -6,3 +14,162 @@ LOG = logging.getLogger(__name__)
 
 def display_iterable(iterable):
     return "\n".join(map(str, iterable))
+
+
+class NullPhase(ContextDecorator):
+    """
+    Phase used when the instrumentation is disabled, does nothing.
+    """
+
+    def __enter__(self) -> "NullPhase":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+class Phase(ContextDecorator):
+    """
+    Named phase, timed and optionally profiled, usable as a context manager or a
+    decorator.
+    """
+
+    def __init__(self, instrumentation: "Instrumentation", name: str) -> None:
+        self.instrumentation = instrumentation
+        self.name = name
+        self.start = None
+        self.profiler = None
+
+    def _recreate_cm(self) -> "Phase":
+        # Fresh phase per decorated call, so recursive calls do not share state
+        return Phase(self.instrumentation, self.name)
+
+    def __enter__(self) -> "Phase":
+        instrumentation = self.instrumentation
+        instrumentation.stack.append(self.name)
+        # cProfile cannot nest, only the outermost profiled phase records
+        if instrumentation.profile and instrumentation.active_profiler is None:
+            self.profiler = cProfile.Profile()
+            instrumentation.active_profiler = self.profiler
+            self.profiler.enable()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        duration = time.perf_counter() - self.start
+        instrumentation = self.instrumentation
+        full_name = "/".join(instrumentation.stack)
+        instrumentation.stack.pop()
+
+        if self.profiler is not None:
+            self.profiler.disable()
+            instrumentation.active_profiler = None
+            self.profiler.dump_stats(instrumentation.get_profile_path(full_name))
+            self.profiler = None
+
+        instrumentation.timings.append({"name": full_name, "duration": duration})
+        return False
+
+
+class Instrumentation:
+    """
+    Per phase timing and profiling.
+
+    Disabled by default, enabled by giving it an output directory (or through the
+    AOC_INSTRUMENTATION_DIR environment variable). When enabled, a JSON timing report
+    is written to that directory, alongside a pstats dump per phase if profiling is
+    on (AOC_PROFILE=1).
+    """
+
+    directory = None
+    profile = False
+    # Distinguish the reports of several runs sharing a run id, e.g. days
+    label = None
+
+    def __init__(self, directory: Optional[str] = None, profile: bool = False) -> None:
+        self.timings = []
+        self.stack = []
+        self.active_profiler = None
+        self.run_id = None
+        self.configure(directory, profile=profile)
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def configure(self, directory: Optional[str], profile: bool = False) -> None:
+        """
+        Enable or disable the instrumentation
+
+        :param directory: Reports directory, None to disable
+        :param profile: Capture a cProfile dump per phase
+        """
+        self.directory = directory
+        self.profile = profile and directory is not None
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def phase(self, name: str) -> ContextDecorator:
+        """
+        Return a timed phase, or a no-op one when disabled
+
+        :param name: Phase name, nested phases are joined with "/"
+        """
+        if self.directory is None:
+            return NULL_PHASE
+        return Phase(self, name)
+
+    def get_file_name(self, name: Optional[str] = None) -> str:
+        components = [self.run_id, self.label, name]
+        file_name = "-".join(component for component in components if component)
+        return re.sub(r"[^\w.-]+", "_", file_name)
+
+    def get_profile_path(self, phase_name: str) -> str:
+        return os.path.join(self.directory, f"{self.get_file_name(phase_name)}.prof")
+
+    def report(self) -> dict:
+        """
+        Machine readable timing report of the recorded phases
+        """
+        return {
+            "run_id": self.run_id,
+            "label": self.label,
+            "pid": os.getpid(),
+            "phases": self.timings,
+        }
+
+    def dump_report(self) -> Optional[str]:
+        """
+        Write the timing report to the output directory and reset the timings
+
+        :return: Report path
+        """
+        if self.directory is None or not self.timings:
+            return None
+
+        path = os.path.join(self.directory, f"{self.get_file_name()}.json")
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        self.timings = []
+        return path
+
+
+INSTRUMENTATION = Instrumentation(
+    os.environ.get("AOC_INSTRUMENTATION_DIR"),
+    profile=os.environ.get("AOC_PROFILE") == "1",
+)
+atexit.register(INSTRUMENTATION.dump_report)
+
+
+def phase(name: str) -> ContextDecorator:
+    """
+    Time a named phase of a run, see Instrumentation.
+
+    with phase("read"):
+        ...
+    """
+    return INSTRUMENTATION.phase(name)
@@ -0,0 +1,224 @@
+"""
+Columnar password database parsing & validation, see day 02.
+
+Lives in an importable module, unlike the day directories, so that worker processes
+started with the spawn or forkserver methods can unpickle validate_database_chunk.
+"""
+import os
+import re
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.context import BaseContext
+from os.path import getsize
+from typing import List, Tuple, Optional, Iterable, Iterator
+
+import numpy as np
+
+from utils.readers import FileReader
+
+PASSWORD_DATABASE_BYTES_LINE_REGEX = re.compile(rb"(\d+)-(\d+) (\w): (\w+)")
+# Parallel validation chunk size, in bytes
+CHUNK_SIZE = 64 * 1024 * 1024
+
+
+class PasswordDatabaseColumns:
+    """
+    Columnar representation of a password database.
+
+    Conditions are held in int arrays, passwords are concatenated in a single byte
+    buffer, password i being passwords[offsets[i]:offsets[i + 1]].
+    """
+
+    min_values = None
+    max_values = None
+    letters = None
+    passwords = None
+    offsets = None
+
+    def __init__(
+        self,
+        min_values: np.ndarray,
+        max_values: np.ndarray,
+        letters: np.ndarray,
+        passwords: np.ndarray,
+        offsets: np.ndarray,
+    ) -> None:
+        self.min_values = min_values
+        self.max_values = max_values
+        self.letters = letters
+        self.passwords = passwords
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.min_values)
+
+    def count_valid_passwords(self, old_rule: bool = False) -> int:
+        """
+        Count the passwords matching their condition, see
+        the day 02 PasswordDatabaseConditions.validate_password for the rules.
+
+        :param old_rule: Use the first rule
+        :return: Number of valid passwords
+        """
+        starts = self.offsets[:-1]
+        lengths = np.diff(self.offsets)
+
+        if not len(self):
+            return 0
+
+        if old_rule:
+            # Occurrences per password, passwords are never empty so every segment
+            # of the reduction is a whole password
+            matches = self.passwords == np.repeat(self.letters, lengths)
+            counts = np.add.reduceat(matches, starts, dtype=np.int32)
+            valid = (self.min_values <= counts) & (counts <= self.max_values)
+            return int(np.count_nonzero(valid))
+
+        match_min = self.match_position(starts, lengths, self.min_values)
+        match_max = self.match_position(starts, lengths, self.max_values)
+        return int(np.count_nonzero(match_min ^ match_max))
+
+    def match_position(
+        self, starts: np.ndarray, lengths: np.ndarray, positions: np.ndarray
+    ) -> np.ndarray:
+        """
+        Check each password holds its letter at the given 1 based position.
+
+        :param starts: Password start offsets
+        :param lengths: Password lengths
+        :param positions: 1 based positions
+        :return: Boolean mask
+        """
+        in_bounds = (1 <= positions) & (positions <= lengths)
+        indexes = np.where(in_bounds, starts + positions - 1, 0)
+        return in_bounds & (self.passwords[indexes] == self.letters)
+
+
+class PasswordDatabaseColumnsReader(FileReader):
+    """
+    Password database file reader parsing into PasswordDatabaseColumns.
+    """
+
+    def read_columns(self) -> PasswordDatabaseColumns:
+        """
+        Parse the database straight into columns, without per line objects.
+        """
+        return parse_database_columns(self.read_lines(binary=True))
+
+    def count_valid_passwords_parallel(
+        self,
+        workers: Optional[int] = None,
+        chunk_size: int = CHUNK_SIZE,
+        mp_context: Optional[BaseContext] = None,
+    ) -> Tuple[int, int, List[int]]:
+        """
+        Validate the database in newline aligned chunks, each one parsed and validated
+        in a worker process.
+
+        Unlike read, lines that cannot be parsed are reported instead of raising.
+
+        :param workers: Number of worker processes, defaults to the CPU count
+        :param chunk_size: Target chunk size in bytes
+        :param mp_context: Worker processes start method context, see
+            multiprocessing.get_context
+        :return: Old rule valid count, new rule valid count, 1 based error lines
+        """
+        workers = workers or os.cpu_count()
+        chunk_count = max(workers * 4, getsize(self.file) // chunk_size + 1)
+        chunk_ranges = self.get_chunk_ranges(chunk_count)
+        if not chunk_ranges:
+            return 0, 0, []
+
+        old_rule_count = 0
+        new_rule_count = 0
+        error_lines = []
+        line_offset = 0
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=mp_context
+        ) as executor:
+            starts, ends = zip(*chunk_ranges)
+            results = executor.map(
+                validate_database_chunk, [self.file] * len(chunk_ranges), starts, ends
+            )
+            for chunk_old_count, chunk_new_count, line_count, chunk_errors in results:
+                old_rule_count += chunk_old_count
+                new_rule_count += chunk_new_count
+                error_lines.extend(line_offset + line for line in chunk_errors)
+                line_offset += line_count
+
+        return old_rule_count, new_rule_count, error_lines
+
+
+def parse_database_columns(
+    lines: Iterable[bytes], error_lines: Optional[List[int]] = None
+) -> PasswordDatabaseColumns:
+    """
+    Parse raw database lines into columns.
+
+    :param lines: Raw lines, empty ones are ignored
+    :param error_lines: If given, collect the 1 based number of invalid lines instead
+        of raising
+    :return: Database columns
+    """
+    min_values = array("q")
+    max_values = array("q")
+    letters = bytearray()
+    passwords = bytearray()
+    offsets = array("q", [0])
+
+    for line_number, line in enumerate(lines, 1):
+        if not line:
+            continue
+        match = PASSWORD_DATABASE_BYTES_LINE_REGEX.match(line)
+        if match is None:
+            if error_lines is None:
+                raise Exception(f"Could not read database line {line.decode()}")
+            error_lines.append(line_number)
+            continue
+        min_value, max_value, letter, password = match.groups()
+        min_values.append(int(min_value))
+        max_values.append(int(max_value))
+        letters += letter
+        passwords += password
+        offsets.append(len(passwords))
+
+    return PasswordDatabaseColumns(
+        np.frombuffer(min_values, dtype=np.int64),
+        np.frombuffer(max_values, dtype=np.int64),
+        np.frombuffer(letters, dtype=np.uint8),
+        np.frombuffer(passwords, dtype=np.uint8),
+        np.frombuffer(offsets, dtype=np.int64),
+    )
+
+
+def validate_database_chunk(
+    file: str, start: int, end: int
+) -> Tuple[int, int, int, List[int]]:
+    """
+    Parse and validate a byte range of a database file, run in worker processes.
+
+    :param file: Database file
+    :param start: Chunk start offset, on a line start
+    :param end: Chunk end offset, on a line start or the end of file
+    :return: Old rule valid count, new rule valid count, line count, 1 based error
+        lines relative to the chunk
+    """
+    lines = PasswordDatabaseColumnsReader(file).iter_lines(
+        binary=True, start=start, end=end, skip_empty=False
+    )
+    line_count = 0
+
+    def count_lines(lines: Iterable[bytes]) -> Iterator[bytes]:
+        nonlocal line_count
+        for line in lines:
+            line_count += 1
+            yield line
+
+    error_lines = []
+    columns = parse_database_columns(count_lines(lines), error_lines)
+    return (
+        columns.count_valid_passwords(old_rule=True),
+        columns.count_valid_passwords(),
+        line_count,
+        error_lines,
+    )
@@ -1,5 +1,13 @@
-from os.path import isfile
-from typing import List, Any, Optional
+import hashlib
+import mmap
+import os
+import pickle
+import sys
+from array import array
+from os.path import isfile, getsize
+from typing import List, Any, Optional, Iterator, Union, Tuple
+
+import numpy as np
 
 
 class Reader:
@@ -14,6 +22,153 @@ class Reader:
         raise NotImplementedError
 
 
+# Chunk size used by FileReader.iter_records, in characters
+RECORD_CHUNK_SIZE = 1024 * 1024
+RECORD_SEPARATOR = "\n\n"
+
+READER_CACHE_DIR = os.environ.get(
+    "AOC_READER_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "aoc-2020", "readers"),
+)
+READER_CACHE_MAX_SIZE = 256 * 1024 * 1024
+
+
+class ReaderCache:
+    """
+    On disk cache of parsed reader outputs.
+
+    Entries are pickled and keyed on the reader class and the source of the modules
+    defining it, the read arguments and the file path, size, mtime and content hash.
+    The directory is bounded in size, the least recently used entries are evicted
+    first. Any entry failing to load is dropped and counted as a miss.
+    """
+
+    directory = None
+    max_size = None
+
+    def __init__(
+        self, directory: str = READER_CACHE_DIR, max_size: int = READER_CACHE_MAX_SIZE
+    ) -> None:
+        self.directory = directory
+        self.max_size = max_size
+
+    @staticmethod
+    def hash_file(file: str) -> str:
+        """
+        Hash the content of a file
+
+        :param file: File path
+        :return: Hex digest
+        """
+        digest = hashlib.blake2b()
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def get_source_hashes(self, reader: "FileReader") -> List[str]:
+        """
+        Hash the source files of the reader class and its bases, so that changing
+        the parsing code invalidates the entries
+
+        :param reader: File reader
+        :return: Hex digests
+        """
+        files = []
+        for cls in type(reader).__mro__:
+            file = getattr(sys.modules.get(cls.__module__), "__file__", None)
+            if file is not None and file not in files:
+                files.append(file)
+        return [self.hash_file(file) for file in files]
+
+    def get_key(self, reader: "FileReader", *args, **kwargs) -> str:
+        """
+        Compute the cache key of a reader call
+
+        :param reader: File reader
+        :return: Cache key
+        """
+        stat = os.stat(reader.file)
+        components = (
+            type(reader).__module__,
+            type(reader).__qualname__,
+            os.path.abspath(reader.file),
+            stat.st_size,
+            stat.st_mtime_ns,
+            self.hash_file(reader.file),
+            self.get_source_hashes(reader),
+            repr(args),
+            repr(sorted(kwargs.items())),
+        )
+        return hashlib.blake2b(repr(components).encode()).hexdigest()
+
+    def read(self, reader: "FileReader", *args, **kwargs) -> Any:
+        """
+        Return the cached parsed output of a reader, parsing and storing it on a miss.
+
+        :param reader: File reader
+        :return: Parsed data
+        """
+        key = self.get_key(reader, *args, **kwargs)
+        path = os.path.join(self.directory, f"{key}.pickle")
+
+        try:
+            with open(path, "rb") as f:
+                data = pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception:
+            # Corrupted entry, or pickled classes that no longer import
+            self.remove(path)
+        else:
+            # Refresh the entry mtime, used as LRU order, best effort as a
+            # concurrent eviction may have removed the entry meanwhile
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return data
+
+        data = reader.read(*args, **kwargs)
+
+        # Storing is best effort, the parsed data is returned anyway
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+            self.evict()
+        except Exception:
+            self.remove(temp_path)
+
+        return data
+
+    @staticmethod
+    def remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def evict(self) -> None:
+        """
+        Remove least recently used entries until the cache fits in max_size.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pickle"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            self.remove(path)
+            total_size -= size
+
+
 class FileReader(Reader):
     """
     Base class for file Reader implementation
@@ -22,10 +177,12 @@ class FileReader(Reader):
     """
 
     file = None
+    cache = None
 
-    def __init__(self, file: str) -> None:
+    def __init__(self, file: str, cache: Optional[ReaderCache] = None) -> None:
         assert isfile(file), f"Cannot import file {file}"
         self.file = file
+        self.cache = cache if cache is not None else ReaderCache()
 
     def read(self, *args, **kwargs) -> str:
         """
@@ -34,6 +191,130 @@ class FileReader(Reader):
         with open(self.file, "r") as f:
             return f.read()
 
+    def cached_read(self, *args, **kwargs) -> Any:
+        """
+        Same as read, but go through the parsed input cache.
+        """
+        return self.cache.read(self, *args, **kwargs)
+
+    def iter_lines(
+        self,
+        binary: bool = False,
+        start: int = 0,
+        end: Optional[int] = None,
+        skip_empty: bool = True,
+    ) -> Iterator[Union[str, bytes]]:
+        """
+        Lazily yield the lines of the file through a memory map.
+
+        Only the current line is materialized, the file content itself stays in the
+        page cache. Meant for callers needing bounded memory, read_lines is much
+        faster otherwise.
+
+        :param binary: Yield raw bytes slices instead of decoded strings
+        :param start: Byte offset of the first line
+        :param end: Byte offset to stop at, end of file by default
+        :param skip_empty: Do not yield empty lines
+        """
+        # mmap cannot map an empty file
+        if not getsize(self.file):
+            return
+
+        with open(self.file, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if end is None or end > len(mapped):
+                    end = len(mapped)
+                while start < end:
+                    newline = mapped.find(b"\n", start, end)
+                    if newline == -1:
+                        newline = end
+                    line = mapped[start:newline].rstrip(b"\r")
+                    start = newline + 1
+                    if line or not skip_empty:
+                        yield line if binary else line.decode()
+
+    def read_lines(self, binary: bool = False) -> List[Union[str, bytes]]:
+        """
+        Read all the non empty lines of the file at once.
+
+        :param binary: Return raw bytes instead of decoded strings
+        """
+        with open(self.file, "rb" if binary else "r") as f:
+            return [line for line in f.read().splitlines() if line]
+
+    def iter_records(self, chunk_size: int = RECORD_CHUNK_SIZE) -> Iterator[str]:
+        """
+        Lazily yield the blank line delimited records of the file.
+
+        The file is read in fixed size chunks, a record spanning several chunks is
+        carried over until its end is read, so memory stays bounded by the chunk
+        size and the largest record.
+
+        :param chunk_size: Number of characters read at once
+        """
+        pending = ""
+        with open(self.file, "r") as f:
+            for chunk in iter(lambda: f.read(chunk_size), ""):
+                records = (pending + chunk).split(RECORD_SEPARATOR)
+                # The last record may continue in the next chunk
+                pending = records.pop()
+                for record in records:
+                    record = record.strip("\n")
+                    if record:
+                        yield record
+
+        pending = pending.strip("\n")
+        if pending:
+            yield pending
+
+    def get_chunk_ranges(self, chunk_count: int) -> List[Tuple[int, int]]:
+        """
+        Split the file in about chunk_count byte ranges aligned on line starts.
+
+        :param chunk_count: Wanted number of chunks
+        :return: (start, end) byte offsets, end excluded
+        """
+        size = getsize(self.file)
+        if not size:
+            return []
+
+        boundaries = [0]
+        with open(self.file, "rb") as f:
+            for index in range(1, chunk_count):
+                f.seek(max(index * size // chunk_count, boundaries[-1]))
+                # Move the boundary just after the next newline
+                f.readline()
+                position = f.tell()
+                if position >= size:
+                    break
+                if position > boundaries[-1]:
+                    boundaries.append(position)
+        boundaries.append(size)
+
+        return list(zip(boundaries[:-1], boundaries[1:]))
+
+    def parse_line(self, line: str) -> Any:
+        """
+        Parse a single line of the file, used by the streaming mode.
+
+        :param line: Raw line
+        :return: Parsed line
+        """
+        return line
+
+    def parse_lines(self, *args, **kwargs) -> List:
+        """
+        Read and parse all the lines of the file at once, see parse_line.
+        """
+        return [self.parse_line(line, *args, **kwargs) for line in self.read_lines()]
+
+    def iter_read(self, *args, **kwargs) -> Iterator:
+        """
+        Streaming counterpart of parse_lines, yielding each parsed line lazily.
+        """
+        for line in self.iter_lines():
+            yield self.parse_line(line, *args, **kwargs)
+
 
 class OneColumnFileReader(FileReader):
     """
@@ -47,18 +328,62 @@ class OneColumnFileReader(FileReader):
     """
 
     def read(
-        self, *args, type_to_cast: Any = None, sort: bool = False, **kwargs
-    ) -> List:
+        self,
+        *args,
+        type_to_cast: Any = None,
+        sort: bool = False,
+        compact: bool = False,
+        **kwargs,
+    ) -> Union[List, array]:
         """
         Implementation of a one column data file read function
 
         :param type_to_cast: Optional type casting for each line
         :param sort: Sort the list
+        :param compact: With int casting, load the values into a 64 bits array
         """
-        data = super(OneColumnFileReader, self).read()
-        split_data = [line for line in data.splitlines() if line]
+        if compact and type_to_cast is int:
+            return self.read_int_array(sort=sort)
+
+        split_data = self.read_lines()
         if type_to_cast is not None:
             split_data = list(map(type_to_cast, split_data))
         if sort:
-            split_data = sorted(split_data)
+            split_data.sort()
         return split_data
+
+    def parse_line(self, line: str, type_to_cast: Any = None, **kwargs) -> Any:
+        """
+        Cast a single column value
+
+        :param line: Raw line
+        :param type_to_cast: Optional type casting
+        """
+        if type_to_cast is not None:
+            return type_to_cast(line)
+        return line
+
+    def read_int_array(self, sort: bool = False) -> Union[List[int], array]:
+        """
+        Parse the file straight into a contiguous signed 64 bits array, in a single
+        vectorized conversion of the file buffer.
+
+        Falls back to a list of Python ints if any value does not fit in 64 bits.
+
+        :param sort: Sort the values
+        :return: Values array
+        """
+        with open(self.file, "rb") as f:
+            values = f.read().split()
+
+        try:
+            data = np.array(values, dtype=np.int64)
+        except OverflowError:
+            data = list(map(int, values))
+            if sort:
+                data.sort()
+            return data
+
+        if sort:
+            data.sort()
+        return array("q", data.tobytes())
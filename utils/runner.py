@@ -0,0 +1,142 @@
+"""
+Run the day solvers.
+
+E.g.
+
+python -m utils.runner
+python -m utils.runner 1 3 8 --jobs 3
+"""
+import argparse
+import importlib.util
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from os.path import abspath, dirname, isdir, isfile, join
+from types import ModuleType
+from typing import Dict, List, Optional
+
+from utils.log import INSTRUMENTATION, LOG
+
+ROOT_DIRECTORY = dirname(dirname(abspath(__file__)))
+DAY_MODULE_FILE = "main.py"
+
+
+def discover_days(root_directory: str = ROOT_DIRECTORY) -> Dict[int, str]:
+    """
+    Find all the day directories holding a solver module
+
+    :param root_directory: Repository root
+    :return: Day number to day directory
+    """
+    days = {}
+    for name in os.listdir(root_directory):
+        directory = join(root_directory, name)
+        if (
+            name.isdecimal()
+            and isdir(directory)
+            and isfile(join(directory, DAY_MODULE_FILE))
+        ):
+            days[int(name)] = directory
+    return dict(sorted(days.items()))
+
+
+def load_day(day_directory: str) -> ModuleType:
+    """
+    Import a day solver module without running it
+
+    Day directories are not valid package names, the module is loaded from its path.
+
+    :param day_directory: Day directory
+    :return: Day module
+    """
+    name = f"day_{os.path.basename(day_directory)}"
+    spec = importlib.util.spec_from_file_location(
+        name, join(day_directory, DAY_MODULE_FILE)
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_day(day_directory: str, input_directory: Optional[str] = None) -> None:
+    """
+    Import a day module and solve it
+
+    :param day_directory: Day directory
+    :param input_directory: Directory of the input files, defaults to day_directory
+    """
+    module = load_day(day_directory)
+    INSTRUMENTATION.label = module.__name__
+    module.main(input_directory or day_directory)
+    INSTRUMENTATION.dump_report()
+
+
+def run_days(
+    days: List[int],
+    jobs: int = 1,
+    root_directory: str = ROOT_DIRECTORY,
+    input_directory: Optional[str] = None,
+) -> List[int]:
+    """
+    Run the requested days, concurrently if jobs > 1
+
+    :param days: Days to run, all days if empty
+    :param jobs: Number of worker processes
+    :param root_directory: Repository root
+    :param input_directory: Override the input files directory of every day
+    :return: Failed days
+    """
+    available_days = discover_days(root_directory)
+    days = days or list(available_days)
+
+    missing_days = [day for day in days if day not in available_days]
+    if missing_days:
+        raise Exception(f"Unknown days {missing_days}")
+
+    if jobs == 1:
+        for day in days:
+            run_day(available_days[day], input_directory)
+        return []
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            day: executor.submit(run_day, available_days[day], input_directory)
+            for day in days
+        }
+        failed_days = []
+        for day, future in futures.items():
+            exception = future.exception()
+            if exception is not None:
+                LOG.error(f"Day {day:02d} failed: {exception!r}")
+                failed_days.append(day)
+
+    return failed_days
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the AOC 2020 day solvers")
+    parser.add_argument("days", nargs="*", type=int, help="Days to run, default all")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="Number of days run concurrently"
+    )
+    parser.add_argument(
+        "-i", "--input-directory", default=None, help="Override the inputs directory"
+    )
+    parser.add_argument(
+        "--instrument", default=None, help="Write timing reports to this directory"
+    )
+    parser.add_argument(
+        "--profile", action="store_true", help="Dump a cProfile per phase"
+    )
+    args = parser.parse_args(argv)
+
+    if args.instrument is not None:
+        INSTRUMENTATION.configure(args.instrument, profile=args.profile)
+
+    if run_days(args.days, jobs=args.jobs, input_directory=args.input_directory):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()